@@ -15,10 +15,9 @@ Troisièmement,
 
 '''
 
-from sympy import *
+from sympy import init_printing, integrate, symbols
 import numpy as np
 import matplotlib.pyplot as plt
-init_printing()
 
 
 class Airplane:
@@ -196,6 +195,7 @@ class Airplane:
         return self.totalNervureWeight
 
 
-
-avion = Airplane()
-avion.getWingShearAndMoment()
\ No newline at end of file
+if __name__ == '__main__':
+    init_printing()
+    avion = Airplane()
+    avion.getWingShearAndMoment()
@@ -1,4 +1,4 @@
-from sympy import *
+from sympy import integrate, symbols
 import numpy as np
 import matplotlib.pyplot as plt
 
@@ -186,9 +186,10 @@ class AirPlane:
         print(shearFactor)
 
 
-plane = AirPlane()
+if __name__ == '__main__':
+    plane = AirPlane()
 
-plane.getWingShearAndMoment()
-plane.getNormalStress()
-plane.getShearStress()
-plane.getFactor()
+    plane.getWingShearAndMoment()
+    plane.getNormalStress()
+    plane.getShearStress()
+    plane.getFactor()
@@ -0,0 +1,173 @@
+# Benchmarks of the pool / geothermy / heater models and of the wing analysis (Résistance des matériaux/TP).
+#   python benchmark.py --output bench.json                      # run and save the timings
+#   python benchmark.py --output new.json --baseline bench.json  # run, then compare with a saved run
+#   python benchmark.py --filter geo --repeat 5                   # only the benchmarks whose name contains "geo"
+#   python benchmark.py --filter startup                          # import time of a fresh worker process
+
+import argparse
+import contextlib
+import datetime
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+import matplotlib
+matplotlib.use("Agg")  # the wing analysis and the models plot with plt.show()
+import matplotlib.pyplot as plt
+
+import numpy as np
+from heatLoss import Pool
+from geothermy import GeoSystem
+from heater import Heater
+from optimizer import Optimizer
+from solver import operatorCache
+from superposition import responseCache
+
+modelDirectory = os.path.dirname(os.path.abspath(__file__))
+wingDirectory = os.path.join(modelDirectory, "..", "..", "Résistance des matériaux", "TP")
+
+
+def benchGeoSystem(numberOfNodes, numberOfYears, wellDistanceStep, timeStep=1):
+    pool = Pool(insulationThickness=0.04)
+    pool.getTotalLoss()
+    geoSystem = GeoSystem(pool, 365 * numberOfYears, timeStep, 100, 100 / numberOfNodes)
+    geoSystem.tmiBlock = 275
+    geoSystem.numberOfWell = 30
+    geoSystem.wellDistanceStep = wellDistanceStep
+    heater = Heater(geoSystem, waterExArea=43, numberOfYears=numberOfYears)
+    heater.getQWaterEx()
+    geoSystem.heater = heater
+    operatorCache.clear()  # each run builds its operator, as a new sweep would
+
+    def run():
+        geoSystem.generateTemporalHeatMap()
+    return run
+
+
+def benchOptimizer():
+    def run():
+        with contextlib.redirect_stdout(io.StringIO()):
+            Optimizer(numberOfYears=5, ins=(0.03, 0.05, 0.01), exArea=(40, 80, 15), tmi=(274, 278, 2), wellNb=(20, 31, 10), depth=(150, 201, 50)).optimize()
+    return run
+
+
+def benchPool():
+    def run():
+        Pool(insulationThickness=0.04).getTotalLoss()
+    return run
+
+
+def benchStartup(modules):
+    # new interpreter importing modules (what each sweep worker process pays before its first system);
+    # fails if a model module pulls in plotting or symbolic packages, which only reporting.py may import
+    code = "import sys\nimport {}\nheavy = [name for name in ('matplotlib', 'sympy') if name in sys.modules]\nsys.exit('imported ' + ', '.join(heavy) if heavy else 0)"
+    code = code.format(", ".join(modules)) if modules else "pass"
+
+    def run():
+        subprocess.run([sys.executable, "-c", code], cwd=modelDirectory, check=True)
+    return run
+
+
+def benchWing(resolution):
+    if wingDirectory not in sys.path:
+        sys.path.append(wingDirectory)
+    from script_JLB import AirPlane
+
+    def run():
+        plane = AirPlane()
+        plane.resolution = resolution
+        plane.getWingShearAndMoment()
+        plt.close("all")
+    return run
+
+
+def getBenchmarks():
+    # name -> function returning the callable to time (setup is not timed)
+    benchmarks = {}
+    for numberOfNodes in (25, 50, 100):
+        benchmarks["geo.nodes{}.years5.well5".format(numberOfNodes)] = lambda n=numberOfNodes: benchGeoSystem(n, 5, 5)
+    for numberOfYears in (1, 10):
+        benchmarks["geo.nodes50.years{}.well5".format(numberOfYears)] = lambda y=numberOfYears: benchGeoSystem(50, y, 5)
+    for wellDistanceStep in (1, 20):
+        benchmarks["geo.nodes50.years5.well{}".format(wellDistanceStep)] = lambda w=wellDistanceStep: benchGeoSystem(50, 5, w)
+    benchmarks["optimizer.sweep72"] = benchOptimizer
+    benchmarks["pool.getTotalLoss"] = benchPool
+    benchmarks["startup.python"] = lambda: benchStartup([])
+    benchmarks["startup.heatLoss"] = lambda: benchStartup(["heatLoss"])
+    benchmarks["startup.geothermy"] = lambda: benchStartup(["geothermy"])
+    benchmarks["startup.optimizer"] = lambda: benchStartup(["optimizer"])
+    benchmarks["startup.sweepWorker"] = lambda: benchStartup(["sweepWorker"])
+    for resolution in (10, 25, 50):
+        benchmarks["wing.resolution{}".format(resolution)] = lambda r=resolution: benchWing(r)
+    return benchmarks
+
+
+def runBenchmarks(repeat=3, nameFilter=None):
+    results = {}
+    for name, setup in getBenchmarks().items():
+        if nameFilter and nameFilter not in name:
+            continue
+        times = []
+        for i in range(repeat):
+            responseCache.clear()
+            run = setup()
+            timeStart = time.perf_counter()
+            run()
+            times.append(time.perf_counter() - timeStart)
+        results[name] = {"min": min(times), "median": float(np.median(times)), "repeat": repeat}
+        print("{:<32} min {:9.4f} s   median {:9.4f} s".format(name, results[name]["min"], results[name]["median"]))
+    return results
+
+
+def getMachineInfo():
+    return {"date": datetime.datetime.now().isoformat(timespec="seconds"), "python": platform.python_version(), "numpy": np.__version__,
+            "platform": platform.platform(), "processor": platform.processor(), "cpus": os.cpu_count()}
+
+
+def compareResults(results, baseline, tolerance):
+    # a benchmark regresses when its best time is more than tolerance slower than in the baseline
+    regressions = []
+    print("\n{:<32}{:>12}{:>12}{:>9}".format("BENCHMARK", "BASELINE s", "NOW s", "RATIO"))
+    for name, result in results.items():
+        if name not in baseline:
+            print("{:<32}{:>12}{:>12.4f}{:>9}".format(name, "-", result["min"], "new"))
+            continue
+        ratio = result["min"] / baseline[name]["min"]
+        flag = ""
+        if ratio > 1 + tolerance:
+            regressions.append(name)
+            flag = "  REGRESSION"
+        print("{:<32}{:>12.4f}{:>12.4f}{:>9.2f}{}".format(name, baseline[name]["min"], result["min"], ratio, flag))
+    return regressions
+
+
+def main(arguments=None):
+    parser = argparse.ArgumentParser(description="Benchmarks of the pool/geothermy/heater models and of the wing analysis.")
+    parser.add_argument("--output", help="JSON file where the timings are written")
+    parser.add_argument("--baseline", help="JSON file of a previous run to compare with")
+    parser.add_argument("--tolerance", type=float, default=0.1, help="allowed slowdown before a regression is reported (0.1 = 10%%)")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--filter", help="only run the benchmarks whose name contains this text")
+    options = parser.parse_args(arguments)
+
+    results = runBenchmarks(options.repeat, options.filter)
+    if options.output:
+        with open(options.output, "w") as file:
+            json.dump({"machine": getMachineInfo(), "results": results}, file, indent=2, sort_keys=True)
+
+    if options.baseline:
+        with open(options.baseline) as file:
+            baseline = json.load(file)["results"]
+        regressions = compareResults(results, baseline, options.tolerance)
+        if regressions:
+            print("\n{} regression(s): {}".format(len(regressions), ", ".join(regressions)))
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
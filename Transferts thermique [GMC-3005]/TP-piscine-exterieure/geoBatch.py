@@ -0,0 +1,146 @@
+# TP - Transferts thermiques (GMC-3005)
+# Simulation groupée de plusieurs GeoSystem: tous les scénarios (nombre de puits, profondeur, tmiBlock, Qpac)
+# avancent dans la même boucle temporelle, chaque pas résolvant toutes les colonnes avec l'opérateur factorisé partagé.
+# Les résultats de chaque GeoSystem sont identiques à ceux de GeoSystem.generateTemporalHeatMap.
+
+import numpy as np
+from geothermy import calculateTmoProfile
+from timing import timed
+
+
+class GeoSystemBatch:
+    def __init__(self, geoSystems):
+        self.geoSystems = list(geoSystems)
+        self.numberOfSystems = len(self.geoSystems)
+
+        reference = self.geoSystems[0]
+        for geoSystem in self.geoSystems:
+            if geoSystem.getOperatorKey() != reference.getOperatorKey() or geoSystem.numberOfTimeStep != reference.numberOfTimeStep:
+                raise ValueError("All systems of a batch must share the same grid, time step and simulation duration.")
+            if geoSystem.engine != "timeStepping":
+                raise ValueError("Batched simulation only supports the 'timeStepping' engine.")
+            if geoSystem.steadyStateExtrapolation:
+                raise ValueError("Batched simulation does not support steady-state early termination.")
+            if geoSystem.adaptiveTimeStep:
+                raise ValueError("Batched simulation does not support adaptive time stepping.")
+
+    @timed("GeoSystemBatch.generateTemporalHeatMap")
+    def generateTemporalHeatMap(self):
+        for geoSystem in self.geoSystems:
+            geoSystem.checkWeatherYears()
+        for geoSystem in self.geoSystems:
+            geoSystem.averageQpac()
+            geoSystem.annualQpac = geoSystem.Qpac
+            geoSystem.Qpac = np.tile(geoSystem.Qpac, geoSystem.numberOfDays//(365*geoSystem.pool.numberOfYears))
+            geoSystem.buildCoefficientsMatrix()
+            geoSystem.allocateHistory()
+
+        ref = self.geoSystems[0]
+        numberOfTimeStep = ref.numberOfTimeStep
+
+        Qpac = np.array([geoSystem.Qpac for geoSystem in self.geoSystems], dtype=float) # (systèmes, temps)
+        mdotTotal = np.array([geoSystem.mdotTotal for geoSystem in self.geoSystems], dtype=float)
+        Cp = np.array([geoSystem.calorificLiquid['Cp'][geoSystem.chosenCalorificLiquid] for geoSystem in self.geoSystems], dtype=float)
+        tmiBlock = np.array([geoSystem.tmiBlock for geoSystem in self.geoSystems], dtype=float)
+        resistance = np.array([geoSystem.totalLineicResistance for geoSystem in self.geoSystems], dtype=float)
+        decayFactor = np.array([geoSystem.getTmoDecayFactor(geoSystem.wellDistanceStep) for geoSystem in self.geoSystems])
+        numberOfSegments = np.array([int(2*geoSystem.wellDepth / geoSystem.wellDistanceStep) for geoSystem in self.geoSystems])
+        segmentGroups = [(segments, np.where(numberOfSegments == segments)[0]) for segments in np.unique(numberOfSegments)] # profils de même longueur calculés ensemble
+
+        TmiList = np.zeros((self.numberOfSystems, numberOfTimeStep - 1))
+        TmoList = np.full((self.numberOfSystems, numberOfTimeStep), 283.0)
+        copList = np.zeros((self.numberOfSystems, numberOfTimeStep - 1))
+        WPac = np.zeros((self.numberOfSystems, numberOfTimeStep - 1))
+        firstNodeTemp = np.zeros((self.numberOfSystems, numberOfTimeStep - 1))
+        fullHistory = all(geoSystem.historyStorage == "full" for geoSystem in self.geoSystems) # historique complet stocké en un seul bloc
+        motherMatrix = np.zeros((self.numberOfSystems, ref.numberOfNodes, numberOfTimeStep)) if fullHistory else None
+        recordingSystems = [(i, geoSystem) for i, geoSystem in enumerate(self.geoSystems) if geoSystem.motherMatrix is not None]
+        dailyTmoList = [None for i in range(self.numberOfSystems)]
+        dailyTmoLast = np.full(self.numberOfSystems, 283.0)
+        TmoMean = np.zeros(self.numberOfSystems)
+
+        liveTempMatrix = np.full((ref.numberOfNodes, self.numberOfSystems), (ref.T0 * (ref.groundrhocp / ref.timeStepSecond)))
+        tempForNextTime = None
+        boundaryFactor = ref.getBoundaryFactor()
+
+        for times in range(numberOfTimeStep - 1):
+            Tsol = np.full(self.numberOfSystems, 283.0) if times == 0 else tempForNextTime[0]
+
+            Tmi = -((Qpac[:, times])/(mdotTotal * Cp)) + dailyTmoLast # calcul de Tmi pour tous les systèmes
+            blocked = Tmi < tmiBlock # bloquage de la température Tmi à la température seuil
+            Tmi[blocked] = tmiBlock[blocked]
+            Qpac[blocked, times] = mdotTotal[blocked] * Cp[blocked] * (TmoList[blocked, times] - Tmi[blocked])
+            TmiList[:, times] = Tmi
+            copList[:, times] = 1 + 5*((Tmi-271)/12)
+            WPac[:, times] = Qpac[:, times]/copList[:, times]
+
+            for segments, group in segmentGroups: # propagation du liquide dans les puits
+                profiles = calculateTmoProfile(Tmi[group], Tsol[group], decayFactor[group], segments)
+                TmoMean[group] = np.mean(profiles, axis=-1)
+                dailyTmoLast[group] = profiles[:, -1]
+                for i, system in enumerate(group):
+                    dailyTmoList[system] = profiles[i]
+            TmoList[:, times + 1] = dailyTmoLast
+
+            if times != 0:
+                liveTempMatrix = np.round(tempForNextTime * (ref.groundrhocp / ref.timeStepSecond), 4)
+            liveTempMatrix[0, :] += ((TmoMean - Tsol)/resistance) / boundaryFactor # Mise à jour des conditions limites
+            liveTempMatrix[-1, :] = ref.T0 # mise à jour de la condition limite à l'infini
+            tempForNextTime = self.solveTempForNextTime(liveTempMatrix)
+            firstNodeTemp[:, times] = tempForNextTime[0]
+            if fullHistory:
+                motherMatrix[:, :, times] = tempForNextTime.T
+            else:
+                for i, geoSystem in recordingSystems:
+                    geoSystem.storeTempData(tempForNextTime[:, i:i + 1], times)
+
+        for i, geoSystem in enumerate(self.geoSystems):
+            geoSystem.Qpac = Qpac[i]
+            geoSystem.TmiList = TmiList[i].tolist()
+            geoSystem.TmoList = TmoList[i].tolist()
+            geoSystem.copList = copList[i].tolist()
+            geoSystem.WPac = WPac[i]
+            geoSystem.firstNodeTempList = firstNodeTemp[i].tolist()
+            geoSystem.dailyTmoList = dailyTmoList[i]
+            geoSystem.dailyTemperatureVariation[:numberOfTimeStep - 1] = TmiList[i] - TmoList[i, 1:]
+            geoSystem.liveTempMatrix = liveTempMatrix[:, i:i + 1]
+            geoSystem.groundTemp = tempForNextTime[:, i:i + 1]
+            geoSystem.stepIndex = numberOfTimeStep - 1
+            if fullHistory:
+                geoSystem.motherMatrix = motherMatrix[i]
+            geoSystem.expandWpacQpacCop()
+            geoSystem.flushHistory()
+
+    @timed("GeoSystemBatch.solveTempForNextTime")
+    def solveTempForNextTime(self, liveTempMatrix):
+        ref = self.geoSystems[0]
+        if ref.solver == "dense":
+            tempNextTimeMatrix = np.linalg.solve(ref.coeffMatrix, liveTempMatrix)
+        else:
+            tempNextTimeMatrix = ref.tridiagonalSolver.solve(liveTempMatrix)
+        return np.round(tempNextTimeMatrix, 5)
+
+
+def isBatchable(geoSystem):
+    # systèmes simulés seuls: autres moteurs, extrapolation du régime périodique ou pas de temps adaptatif
+    return geoSystem.engine == "timeStepping" and not geoSystem.steadyStateExtrapolation and not geoSystem.adaptiveTimeStep
+
+
+def computeHeaters(heaters):
+    # Équivalent de heater.getQExchanger() pour chaque heater, avec la géothermie simulée en un seul lot
+    for heater in heaters:
+        heater.checkYears()
+        heater.getQWaterEx()
+        heater.geoSystem.heater = heater
+
+    geoHeaters = [heater for heater in heaters if not heater.skipGeothermy and isBatchable(heater.geoSystem)]
+    for heater in heaters:
+        if not heater.skipGeothermy and not isBatchable(heater.geoSystem):
+            heater.checkGeothermy()
+    if geoHeaters:
+        GeoSystemBatch([heater.geoSystem for heater in geoHeaters]).generateTemporalHeatMap()
+        for heater in geoHeaters:
+            heater.getGeothermyResults()
+
+    for heater in heaters:
+        heater.completeExchanger()
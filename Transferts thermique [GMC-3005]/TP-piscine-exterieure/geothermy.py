@@ -3,8 +3,13 @@
 # Hypothèses: direction radiale aucune résistance de contact entre le sol et l'échangeur
 
 import numpy as np
-import matplotlib.pyplot as plt
 import math as m
+import os
+import tempfile
+import weakref
+from solver import TridiagonalSolver, operatorCache
+from superposition import SuperpositionEngine
+from timing import timed
 
 
 class GeoSystem:
@@ -25,6 +30,12 @@ class GeoSystem:
         self.distanceStep = distanceStep
         self.numberOfNodes = int(numberOfMeters/distanceStep)
 
+        self.radialGrid = "uniform" # "uniform" (distanceStep sur numberOfMeters) ou "stretched" (raffinée à la paroi, tronquée au champ lointain)
+        self.firstDistanceStep = 0.02 # "stretched": premier pas à la paroi du conduit [m]
+        self.gridStretchFactor = 1.2 # "stretched": rapport entre deux pas successifs
+        self.farFieldFactor = 4 # "stretched": rayon extérieur = ductRadius + farFieldFactor * sqrt(diffusivité * durée), au plus numberOfMeters
+        self.nodeRadius = None # "stretched": rayon de chaque noeud, fixé à la construction de l'opérateur
+
         #  ======== PROFESSOR PARAMETERS ======
 
         self.groundConductivity = 2.5 # W/(m2⋅K)
@@ -51,6 +62,15 @@ class GeoSystem:
         self.wellDepth = 200
         self.wellDistanceStep = 5
 
+        self.solver = "tridiagonal" # "tridiagonal" (factorisé une fois, O(n) par pas) ou "dense" (référence np.linalg.solve)
+        self.engine = "timeStepping" # "timeStepping" (résolution pas à pas) ou "superposition" (réponse impulsionnelle + convolution FFT)
+        self.superpositionBlockLength = 512 # moteur par superposition: pas de temps résolus entre deux convolutions de l'historique
+
+        self.historyStorage = "full" # historique des températures du sol: "full", "strided", "nodes", "memmap" ou "none"
+        self.historyStride = 10 # "strided": un pas de temps conservé sur historyStride
+        self.historyNodes = [0] # "nodes": noeuds conservés
+        self.historyFile = None # "memmap": fichier sur disque (si None, fichier temporaire effacé quand la matrice est libérée)
+
         self.calorificLiquid = {"Nature": ["Water"], "Density": [1040], "Cp": [3.8* 10 ** 3 ], "Speed": [3], "h": [8500]}
         # density : kg/m³
         # Cp : J/(kg·K)
@@ -76,139 +96,528 @@ class GeoSystem:
         self.TmiList = []
         self.timeStepSecond = self.timeStep * 3600 * 24 # seconds
 
+        self.stepIndex = 0 # prochain pas de temps à résoudre
+        self.groundTemp = None # températures du sol au dernier pas résolu
+        self.annualQpac = None
+        self.stepQpac = None # Qpac, WPac et copList par pas de temps, conservés par expandWpacQpacCop pour prolonger la simulation
+        self.stepWPac = None
+        self.stepCopList = None
+        self.checkpointFile = None # sauvegarde périodique de l'état (reprise après un arrêt)
+        self.checkpointInterval = 73 # pas de temps entre deux sauvegardes
+
+        self.steadyStateExtrapolation = False # arrêt anticipé: les années restantes sont extrapolées dès que la dérive du sol est bornée
+        self.steadyStateTolerance = 0.5 # K, dérive restante maximale du premier noeud jusqu'à la fin de la simulation
+        self.convergenceYear = None # dernière année simulée, les suivantes sont extrapolées
+        self.convergenceStep = None
+        self.convergenceRatio = 0 # rapport des écarts entre cycles successifs, utilisé pour extrapoler les années restantes
+        self.firstNodeTempList = [] # température du premier noeud après chaque pas [K]
+
+        # Grands pas de temps pendant les périodes sans charge ou à charge stable. Gain mesuré au pas journalier (timeStep=1,
+        # 25 ans: 1.0 à 2.6 fois plus rapide); au pas de 5 jours de l'optimiseur, le sol se relaxe en quelques pas après chaque
+        # changement de charge, les grands pas sont rares et le calcul n'est pas plus rapide (souvent plus lent): désactivé par défaut.
+        self.adaptiveTimeStep = False
+        self.adaptiveMaxStep = 16 # nombre maximal de pas de base regroupés en un seul pas (puissance de 2)
+        self.adaptiveLoadTolerance = 0.02 # variation maximale de Qpac dans un grand pas (fraction du Qpac maximal)
+        self.adaptiveTemperatureTolerance = 0.05 # K, écart maximal (estimé, puis vérifié) du premier noeud à sa tendance linéaire pendant un grand pas
+        self.macroStepCount = 0 # nombre de résolutions effectuées avec un grand pas (y compris les pas refusés)
+
         #  ========  INITIALIZATION OF THE MATRIX EQUATION SYSTEM ======
 
         self.liveTempMatrix = np.full((self.numberOfNodes, 1), (self.T0 * (self.groundrhocp / self.timeStepSecond)))
-        self.coeffMatrix = np.zeros((self.numberOfNodes, self.numberOfNodes))
-        self.motherMatrix = np.zeros((self.numberOfNodes, self.numberOfTimeStep)) # matrice des températures pour tous les noeuds. Chaque jours, la solution est stocké dans cette matrice
+        self.coeffMatrix = None # matrice dense, construite seulement pour le solveur "dense"
+        self.tridiagonalSolver = None # opérateur tridiagonal factorisé, partagé via operatorCache
+        self.motherMatrix = None # matrice des températures conservées (noeuds x temps), allouée selon historyStorage par allocateHistory
+        self.historyTimes = None # pas de temps correspondant à chaque colonne de motherMatrix
+        self.historyNodeIndices = None # noeud correspondant à chaque ligne de motherMatrix
 
 
     # ====== MAIN FUNCTION ========
 
+    @timed("GeoSystem.generateTemporalHeatMap")
     def generateTemporalHeatMap(self):
+        self.checkWeatherYears() # avant de répéter le cycle de charge sur la durée simulée
         self.averageQpac() # formattage de liste
-        self.Qpac = np.tile(self.Qpac, self.numberOfDays//365)# formattage de liste
-        self.buildCoefficientsMatrix() # construction de la matrice des coefficients
-        tempForNextTime = [283] # condition initial pour le premier jour, température de 283 K dans le sol
-
-        for times in range(self.numberOfTimeStep -1): # boucle d'itération sur tous les temps
-
-            if times == 0: # Résolution de l'équation et cacul des variables pour la première journée avec les conditions initiales
-                self.TmiList.append(-((self.Qpac[times])/(self.mdotTotal * self.calorificLiquid['Cp'][self.chosenCalorificLiquid])) + 283) # calcul de Tmi
-
-                if self.TmiList[-1] < self.tmiBlock: # bloquage de la température Tmi pour continuer à opérer la PAC à la température seuil
-                    block = self.tmiBlock
-                    self.TmiList[times] = self.tmiBlock
-                    self.Qpac[times] = self.calculateQPACCorrected(block, self.TmoList[times])
-                    self.copList.append(self.calculateCOP(block))
-                    self.WPac.append(self.calculateWPAC(block, 4, self.Qpac[times], self.copList[times]))
-
-                else:
-                    self.copList.append(self.calculateCOP(self.TmiList[times]))
-                    self.WPac.append(self.calculateWPAC(self.TmiList[times], 4, self.Qpac[times], self.copList[times]))
+        self.annualQpac = self.Qpac # cycle de charge moyenné par pas de temps: une année, ou les pool.numberOfYears années de la source météo (pour prolonger la simulation)
+        self.Qpac = np.tile(self.Qpac, self.numberOfDays//(365*self.pool.numberOfYears))# formattage de liste
+        self.buildCoefficientsMatrix() # construction (ou réutilisation) de la matrice des coefficients factorisée
+        self.allocateHistory() # allocation de la matrice des températures selon la politique de stockage
 
-                self.dailyTmoList = (self.calculateTmoList(self.TmiList[times], self.wellDepth, self.wellDistanceStep, 283)) # calcul de Tmo pendant sa propagation dans les puits
-                self.TmoList.append(self.dailyTmoList[-1])
-                TmoMean = np.mean(self.dailyTmoList) # moyenne pondérée de Tmo
-                self.dailyTemperatureVariation[times] = (self.TmiList[-1] - self.TmoList[-1])
+        if self.engine == "superposition":
+            SuperpositionEngine(self).generateTemporalHeatMap()
+        elif self.engine == "timeStepping":
+            self.advanceToEnd()
+        else:
+            raise ValueError("Unknown engine '{}', expected 'timeStepping' or 'superposition'.".format(self.engine))
 
+        self.finishTemporalHeatMap()
 
+    def checkWeatherYears(self):
+        if self.numberOfDays % (365*self.pool.numberOfYears):
+            raise ValueError("The ground simulation ({} days) must cover a whole number of the {} years of the pool.".format(self.numberOfDays, self.pool.numberOfYears))
 
-                self.liveTempMatrix[0, 0] += ((TmoMean - 283)/self.totalLineicResistance) / (m.pi * self.ductRadius * self.distanceStep)  # Mise à jour des conditions limites pour la résolution du prochain jour
-                self.liveTempMatrix[-1, -1] = self.T0 # mise à jour de la condition limite à l'infini
-                tempForNextTime = self.solveTempForNextTime(self.liveTempMatrix) # solution du système d'équation
-                self.storeTempData(tempForNextTime, times) # stockage des données den la journée
-
-            else: # Résolution de l'équation et calcul des variables pour toutes les autres journées avec comme conditions initiales les paramètres de la veille
-
-                self.TmiList.append(-((self.Qpac[times])/(self.mdotTotal*self.calorificLiquid['Cp'][self.chosenCalorificLiquid])) + self.dailyTmoList[-1])
-
-                if self.TmiList[-1] < self.tmiBlock:
-                        block = self.tmiBlock
-                        self.TmiList[times] = self.tmiBlock
-                        self.Qpac[times] = self.calculateQPACCorrected(block, self.TmoList[times])
-                        self.copList.append(self.calculateCOP(block))
-                        self.WPac.append(self.calculateWPAC(block, 4, self.Qpac[times], self.copList[times]))
-
-                else:
-                    self.copList.append(self.calculateCOP(self.TmiList[times]))
-                    self.WPac.append(self.calculateWPAC(self.TmiList[times], 4, self.Qpac[times], self.copList[times]))
-
-
-                self.dailyTmoList = (self.calculateTmoList(self.TmiList[times], self.wellDepth, self.wellDistanceStep, tempForNextTime[0][0]))
-                self.TmoList.append(self.dailyTmoList[-1])
-                TmoMean = np.mean(self.dailyTmoList)
-                self.dailyTemperatureVariation[times] = (self.TmiList[-1] - self.TmoList[-1])
-
+    def finishTemporalHeatMap(self):
+        self.WPac = np.array(self.WPac) # reformattage des listes de données
+        self.expandWpacQpacCop() # reformattage des listes de données
+        self.flushHistory()
 
+    def advanceTimeSteps(self, stopStep):
+        # Résolution de l'équation du pas self.stepIndex jusqu'au pas stopStep (exclu); l'état est conservé entre les appels
+        for times in range(self.stepIndex, stopStep): # boucle d'itération sur tous les temps
 
-                self.liveTempMatrix = np.round(tempForNextTime * (self.groundrhocp / self.timeStepSecond), 4) #formattage avec le nombre de décimales voulu
+            if times == 0: # première journée avec les conditions initiales, température de 283 K dans le sol
+                Tsol = 283
+            else: # conditions initiales selon les paramètres de la veille
+                Tsol = self.groundTemp[0][0]
+                self.liveTempMatrix = np.round(self.groundTemp * (self.groundrhocp / self.timeStepSecond), 4) #formattage avec le nombre de décimales voulu
 
-                self.liveTempMatrix[0, 0] += ((TmoMean - tempForNextTime[0][0])/self.totalLineicResistance) / (m.pi * self.ductRadius * self.distanceStep)# Mise à jour des conditions limites pour la résolution du prochain jour
-                self.liveTempMatrix[-1, -1] = self.T0 # mise à jour de la condition limite à l'infini
-                tempForNextTime = self.solveTempForNextTime(self.liveTempMatrix)
-                self.storeTempData(tempForNextTime, times)
+            self.TmiList.append(-((self.Qpac[times])/(self.mdotTotal*self.calorificLiquid['Cp'][self.chosenCalorificLiquid])) + self.TmoList[-1]) # calcul de Tmi
 
-        self.WPac = np.array(self.WPac) # reformattage des listes de données
-        self.expandWpacQpacCop() # reformattage des listes de données
+            if self.TmiList[-1] < self.tmiBlock: # bloquage de la température Tmi pour continuer à opérer la PAC à la température seuil
+                block = self.tmiBlock
+                self.TmiList[times] = self.tmiBlock
+                self.Qpac[times] = self.calculateQPACCorrected(block, self.TmoList[times])
+                self.copList.append(self.calculateCOP(block))
+                self.WPac.append(self.calculateWPAC(block, 4, self.Qpac[times], self.copList[times]))
 
+            else:
+                self.copList.append(self.calculateCOP(self.TmiList[times]))
+                self.WPac.append(self.calculateWPAC(self.TmiList[times], 4, self.Qpac[times], self.copList[times]))
+
+            self.dailyTmoList = (self.calculateTmoList(self.TmiList[times], self.wellDepth, self.wellDistanceStep, Tsol)) # calcul de Tmo pendant sa propagation dans les puits
+            self.TmoList.append(self.dailyTmoList[-1])
+            TmoMean = np.mean(self.dailyTmoList) # moyenne pondérée de Tmo
+            self.dailyTemperatureVariation[times] = (self.TmiList[-1] - self.TmoList[-1])
+
+            self.liveTempMatrix[0, 0] += ((TmoMean - Tsol)/self.totalLineicResistance) / self.getBoundaryFactor() # Mise à jour des conditions limites pour la résolution du prochain jour
+            self.liveTempMatrix[-1, -1] = self.T0 # mise à jour de la condition limite à l'infini
+            self.groundTemp = self.solveTempForNextTime(self.liveTempMatrix) # solution du système d'équation
+            self.firstNodeTempList.append(self.groundTemp[0][0])
+            self.storeTempData(self.groundTemp, times) # stockage des données de la journée
+            self.stepIndex = times + 1
+
+            if self.checkpointFile is not None and self.stepIndex % self.checkpointInterval == 0:
+                self.saveState(self.checkpointFile)
+
+    def advanceToEnd(self):
+        stopStep = self.numberOfTimeStep - 1
+        if self.convergenceStep is not None: # prolongation d'une simulation extrapolée: reprise après le dernier cycle simulé
+            self.discardExtrapolation()
+        if not self.steadyStateExtrapolation:
+            self.advanceSteps(stopStep)
+            return
+
+        stepsPerYear = len(self.annualQpac)
+        while self.stepIndex < stopStep: # simulation année par année jusqu'à ce que la dérive restante du sol soit bornée
+            if self.stepIndex % stepsPerYear == 0 and self.isPeriodicSteadyState(stepsPerYear):
+                self.convergenceYear = self.stepIndex // stepsPerYear
+                self.convergenceStep = self.stepIndex
+                self.extrapolateSteadyState(stopStep)
+            else:
+                self.advanceSteps(min((self.stepIndex // stepsPerYear + 1) * stepsPerYear, stopStep))
+
+    def advanceSteps(self, stopStep):
+        if not self.adaptiveTimeStep:
+            self.advanceTimeSteps(stopStep)
+            return
+        loadTolerance = self.adaptiveLoadTolerance * max(np.max(np.abs(self.annualQpac)), 1) # W
+        while self.stepIndex < stopStep:
+            numberOfSteps = self.getAdaptiveStepLength(stopStep, loadTolerance)
+            if numberOfSteps == 1: # transitoire ou bloquage: pas de base, même calcul qu'en pas fixe
+                self.advanceTimeSteps(self.stepIndex + 1)
+            else:
+                self.advanceMacroStep(numberOfSteps)
+
+    def getAdaptiveStepLength(self, stopStep, loadTolerance):
+        # plus grand pas de n pas de base (puissance de 2) sur lequel Qpac varie peu, Tmi reste au-dessus de tmiBlock,
+        # le liquide est à l'équilibre et le premier noeud suit une droite: son écart à la droite après n pas est estimé
+        # par la moitié de la différence seconde sur les 2n derniers pas (n**2/2 fois la dérivée seconde)
+        times = self.stepIndex
+        firstNodeTemp = self.firstNodeTempList
+        Tsol = firstNodeTemp[-1] if firstNodeTemp else None
+        numberOfSteps = 1
+        if self.TmiList and self.TmiList[-1] <= self.tmiBlock: # PAC bloquée: pas de base
+            return numberOfSteps
+        while numberOfSteps * 2 <= min(self.adaptiveMaxStep, stopStep - times) and len(firstNodeTemp) > numberOfSteps * 4:
+            if abs(Tsol - 2 * firstNodeTemp[-1 - numberOfSteps * 2] + firstNodeTemp[-1 - numberOfSteps * 4]) / 2 > self.adaptiveTemperatureTolerance:
+                break
+            Qpac = self.Qpac[times:times + numberOfSteps * 2]
+            if np.max(np.abs(Qpac - Qpac[0])) > loadTolerance or np.min(self.getLoopEquilibrium(Qpac, Tsol)[0]) < self.tmiBlock:
+                break
+            if numberOfSteps == 1 and abs(self.getLoopEquilibrium(self.Qpac[times], Tsol)[1] - self.TmoList[-1]) > self.adaptiveTemperatureTolerance:
+                break
+            numberOfSteps *= 2
+        return numberOfSteps
+
+    def getLoopEquilibrium(self, Qpac, Tsol):
+        # Tmi et Tmo du liquide à l'équilibre de la boucle: Tmo - Tmi = Qpac/(mdot*Cp) et Tsol - Tmo = (Tsol - Tmi) * decay**N
+        mdotCp = self.mdotTotal*self.calorificLiquid['Cp'][self.chosenCalorificLiquid]
+        loopDecay = self.getTmoDecayFactor(self.wellDistanceStep) ** int(2*self.wellDepth / self.wellDistanceStep)
+        Tmi = Tsol - (Qpac/mdotCp) / (1 - loopDecay)
+        return Tmi, Tmi + Qpac/mdotCp
+
+    def advanceMacroStep(self, numberOfSteps):
+        # Un seul pas implicite de numberOfSteps * timeStep jours (schéma inconditionnellement stable).
+        # Le liquide est pris à l'équilibre de la boucle avec Tsol, qu'il atteint en quelques pas de base;
+        # les résultats sont ensuite répartis sur les pas de base, avec Tsol interpolé entre le début et la fin du pas
+        # (Tmi avec le Tsol du pas de base précédent, comme en pas fixe où il suit le Tmo de la veille).
+        # Le pas est refusé (puis coupé en deux) si le premier noeud s'écarte de plus de adaptiveTemperatureTolerance
+        # de la droite prolongeant le dernier pas de base, ou si Tmi passe sous tmiBlock.
+        times = self.stepIndex
+        previousTemp = np.full((self.numberOfNodes, 1), float(self.T0)) if self.groundTemp is None else self.groundTemp
+        Tsol = previousTemp[0][0]
+        temperatureRate = self.firstNodeTempList[-1] - self.firstNodeTempList[-2] # variation du premier noeud au dernier pas de base
+        while True:
+            steps = slice(times, times + numberOfSteps)
+            groundTemp = self.solveMacroStep(previousTemp, self.getLoopEquilibrium(np.mean(self.Qpac[steps]), Tsol)[0], numberOfSteps)
+            TsolSteps = Tsol + (groundTemp[0][0] - Tsol) * np.arange(numberOfSteps) / numberOfSteps # Tsol au début de chaque pas de base
+            Tmi = self.getLoopEquilibrium(self.Qpac[steps], TsolSteps - (groundTemp[0][0] - Tsol) / numberOfSteps)[0] # Tmi suit le Tmo du pas précédent
+            Tmo = self.getLoopEquilibrium(self.Qpac[steps], TsolSteps)[1]
+            accepted = abs(groundTemp[0][0] - Tsol - temperatureRate * numberOfSteps) <= self.adaptiveTemperatureTolerance and np.min(Tmi) >= self.tmiBlock
+            if accepted or numberOfSteps <= 2:
+                break
+            numberOfSteps //= 2
+        if not accepted:
+            self.advanceTimeSteps(times + 1) # même un pas double est trop grand: pas de base
+            return
+        self.groundTemp = groundTemp
+        cop = self.calculateCOP(Tmi)
+
+        self.TmiList.extend(Tmi.tolist())
+        self.TmoList.extend(np.round(Tmo, 6).tolist())
+        self.copList.extend(cop.tolist())
+        self.WPac.extend((self.Qpac[steps] / cop).tolist())
+        self.dailyTemperatureVariation[steps] = Tmi - Tmo
+        fractions = np.arange(1, numberOfSteps + 1) / numberOfSteps # températures du sol interpolées sur les pas de base
+        self.firstNodeTempList.extend(np.round(Tsol + (groundTemp[0][0] - Tsol) * fractions, 5).tolist())
+        if self.motherMatrix is not None:
+            for i in range(numberOfSteps):
+                self.storeTempData(np.round(previousTemp + (groundTemp - previousTemp) * fractions[i], 5), times + i)
+        self.stepIndex = times + numberOfSteps
+
+        if self.checkpointFile is not None and self.stepIndex // self.checkpointInterval != times // self.checkpointInterval:
+            self.saveState(self.checkpointFile)
+
+    def solveMacroStep(self, previousTemp, Tmi, numberOfSteps):
+        # températures du sol après un pas implicite de numberOfSteps pas de base, le liquide entrant à Tmi
+        macroTimeStep = self.timeStep * numberOfSteps
+        storageFactor = self.groundrhocp / (macroTimeStep * 3600 * 24)
+        solver = operatorCache.get(self.getOperatorKey(macroTimeStep), lambda: self.buildCoefficientsDiagonals(macroTimeStep))
+        self.macroStepCount += 1
+        Tsol = previousTemp[0][0]
+        self.dailyTmoList = self.calculateTmoList(Tmi, self.wellDepth, self.wellDistanceStep, Tsol)
+        TmoMean = np.mean(self.dailyTmoList)
+        liveTempMatrix = np.round(previousTemp * storageFactor, 4)
+        liveTempMatrix[0, 0] += ((TmoMean - Tsol)/self.totalLineicResistance) / self.getBoundaryFactor()
+        liveTempMatrix[-1, -1] = self.T0
+        if self.solver == "dense":
+            return np.round(np.linalg.solve(solver.toDense(), liveTempMatrix), 5)
+        return np.round(solver.solve(liveTempMatrix), 5)
+
+    def isPeriodicSteadyState(self, stepsPerYear):
+        # Les écarts entre cycles successifs du premier noeud diminuent d'une année à l'autre: la dérive restante jusqu'à la fin
+        # de la simulation est donc au plus le dernier écart fois le nombre de cycles restants. L'extrapolation géométrique
+        # (rapport des deux derniers écarts) reste entre le dernier cycle et cette borne, son erreur aussi.
+        if self.stepIndex < 3 * stepsPerYear:
+            return False
+        firstNodeTemp = np.array(self.firstNodeTempList[self.stepIndex - 3 * stepsPerYear:self.stepIndex]).reshape(3, stepsPerYear)
+        lastChange, previousChange = firstNodeTemp[2] - firstNodeTemp[1], firstNodeTemp[1] - firstNodeTemp[0]
+        self.convergenceRatio = min(max(np.dot(lastChange, previousChange) / max(np.dot(previousChange, previousChange), 10 ** (-12)), 0), 1)
+        remainingCycles = (self.numberOfTimeStep - 1 - self.stepIndex) / stepsPerYear
+        return np.max(np.abs(lastChange)) * remainingCycles <= self.steadyStateTolerance
+
+    def extrapolateSteadyState(self, stopStep):
+        # les pas restants prolongent la tendance des derniers cycles: l'écart d'un cycle au suivant décroît
+        # géométriquement (rapport convergenceRatio), le cycle j après la convergence vaut X + écart * r(1 - r**j)/(1 - r)
+        stepsPerYear = len(self.annualQpac)
+        steps = np.arange(self.stepIndex, stopStep)
+        sources = self.convergenceStep - stepsPerYear + (steps - self.convergenceStep) % stepsPerYear
+        trend = self.getTrendFactors((steps - self.convergenceStep) // stepsPerYear + 1, self.convergenceRatio)
+
+        firstNodeTemp, TmoList = np.array(self.firstNodeTempList), np.array(self.TmoList)
+        self.firstNodeTempList.extend(np.round(firstNodeTemp[sources] + (firstNodeTemp[sources] - firstNodeTemp[sources - stepsPerYear]) * trend, 5).tolist())
+        Tmo = np.round(TmoList[sources + 1] + (TmoList[sources + 1] - TmoList[sources + 1 - stepsPerYear]) * trend, 6)
+        previousTmo = np.concatenate(([self.TmoList[self.stepIndex]], Tmo[:-1]))
+        self.TmoList.extend(Tmo.tolist())
+
+        # Tmi, bloquage, COP et WPac recalculés comme en pas fixe à partir des Tmo extrapolés
+        Qpac = self.annualQpac[steps % len(self.annualQpac)]
+        Tmi = -(Qpac/(self.mdotTotal*self.calorificLiquid['Cp'][self.chosenCalorificLiquid])) + previousTmo
+        blocked = Tmi < self.tmiBlock
+        Tmi[blocked] = self.tmiBlock
+        Qpac[blocked] = self.calculateQPACCorrected(self.tmiBlock, previousTmo[blocked])
+        cop = self.calculateCOP(Tmi)
+        self.TmiList.extend(Tmi.tolist())
+        self.copList.extend(cop.tolist())
+        self.WPac.extend(self.calculateWPAC(Tmi, 4, Qpac, cop).tolist())
+        self.Qpac[steps] = Qpac
+        self.dailyTemperatureVariation[steps] = Tmi - Tmo
+
+        if self.motherMatrix is not None:
+            historyPeriod = np.lcm(stepsPerYear, self.historyStride) if self.historyStorage == "strided" else stepsPerYear # cycle dont les pas sont conservés
+            columns = np.where((self.historyTimes >= self.stepIndex) & (self.historyTimes < stopStep))[0]
+            sourceTimes = self.convergenceStep - historyPeriod + (self.historyTimes[columns] - self.convergenceStep) % historyPeriod
+            sourceColumns = self.getHistoryColumns(sourceTimes)
+            previousColumns = self.getHistoryColumns(sourceTimes - historyPeriod)
+            kept = sourceColumns >= 0
+            trended = kept & (previousColumns >= 0) # sans le cycle précédent conservé, la colonne est répétée
+            trend = self.getTrendFactors((self.historyTimes[columns] - self.convergenceStep) // historyPeriod + 1, self.convergenceRatio ** (historyPeriod // stepsPerYear))
+            self.motherMatrix[:, columns[kept]] = self.motherMatrix[:, sourceColumns[kept]]
+            self.motherMatrix[:, columns[trended]] += (self.motherMatrix[:, sourceColumns[trended]] - self.motherMatrix[:, previousColumns[trended]]) * trend[trended]
+        self.stepIndex = stopStep
+
+    def discardExtrapolation(self):
+        # retour au dernier pas simulé avant l'extrapolation (l'état du sol groundTemp n'a pas été extrapolé)
+        steps = np.arange(self.convergenceStep, self.stepIndex)
+        self.Qpac[steps] = self.annualQpac[steps % len(self.annualQpac)]
+        self.dailyTemperatureVariation[steps] = 0
+        del self.TmiList[self.convergenceStep:], self.WPac[self.convergenceStep:], self.copList[self.convergenceStep:]
+        del self.firstNodeTempList[self.convergenceStep:], self.TmoList[self.convergenceStep + 1:]
+        self.stepIndex = self.convergenceStep
+        self.convergenceYear = self.convergenceStep = None
+
+    def getHistoryColumns(self, times):
+        # colonne de motherMatrix de chaque pas (-1 si le pas n'est pas conservé)
+        columns = np.minimum(np.searchsorted(self.historyTimes, times), len(self.historyTimes) - 1)
+        return np.where((times >= 0) & (self.historyTimes[columns] == times), columns, -1)
+
+    def getTrendFactors(self, cyclesAhead, ratio):
+        # somme r + r**2 + ... + r**j des écarts à venir, pour j cycles après le dernier cycle simulé
+        if ratio == 1:
+            return cyclesAhead.astype(float)
+        return ratio * (1 - ratio ** cyclesAhead) / (1 - ratio)
+
+    # ===== CHECKPOINTS AND EXTENSIONS  ====
+
+    def extendSimulation(self, numberOfYears):
+        # Prolonge une simulation terminée de numberOfYears années sans recalculer les années déjà simulées.
+        # Seul le sol est prolongé: avec un Heater, passer par Heater.extend qui recalcule aussi les échangeurs et les coûts.
+        if self.engine != "timeStepping":
+            raise ValueError("Only the 'timeStepping' engine can be extended, got '{}'.".format(self.engine))
+        self.restoreStepOutputs()
+
+        oldNumberOfTimeStep = self.numberOfTimeStep
+        self.numberOfDays += 365 * numberOfYears
+        self.numberOfTimeStep = int(self.numberOfDays / self.timeStep)
+        stepsPerYear = len(self.annualQpac) // self.pool.numberOfYears
+        nextSteps = np.roll(self.annualQpac, -(len(self.Qpac) % len(self.annualQpac))) # suite du cycle de charge
+        self.Qpac = np.concatenate((self.Qpac, np.resize(nextSteps, stepsPerYear * numberOfYears)))
+        self.dailyTemperatureVariation = np.concatenate((self.dailyTemperatureVariation, np.full(self.numberOfTimeStep - oldNumberOfTimeStep, 0)))
+        self.extendHistory(oldNumberOfTimeStep)
+
+        self.advanceToEnd()
+        self.finishTemporalHeatMap()
+
+    def resumeSimulation(self):
+        # Termine une simulation rechargée avec loadState (par exemple après un arrêt en cours de calcul)
+        self.buildCoefficientsMatrix()
+        if self.motherMatrix is None and self.historyStorage != "none":
+            self.allocateHistory()
+        self.advanceToEnd()
+        self.finishTemporalHeatMap()
+
+    def restoreStepOutputs(self):
+        # retour aux listes par pas de temps (avant expandWpacQpacCop)
+        if self.stepQpac is not None:
+            self.Qpac = np.array(self.stepQpac)
+            self.WPac = list(self.stepWPac)
+            self.copList = list(self.stepCopList)
+            self.stepQpac = self.stepWPac = self.stepCopList = None
+
+    def saveState(self, path):
+        if self.stepQpac is not None:
+            Qpac, WPac, copList = self.stepQpac, self.stepWPac, self.stepCopList
+        else:
+            Qpac, WPac, copList = self.Qpac, self.WPac, self.copList
+
+        np.savez(path, stepIndex=self.stepIndex, numberOfDays=self.numberOfDays, parameters=np.array(self.getStateParameters()),
+                 liveTempMatrix=self.liveTempMatrix, groundTemp=np.array([] if self.groundTemp is None else self.groundTemp),
+                 dailyTmoList=np.array(self.dailyTmoList), TmiList=np.array(self.TmiList), TmoList=np.array(self.TmoList),
+                 WPac=np.array(WPac), copList=np.array(copList), Qpac=np.array(Qpac), annualQpac=np.array(self.annualQpac),
+                 dailyTemperatureVariation=self.dailyTemperatureVariation, firstNodeTempList=np.array(self.firstNodeTempList),
+                 convergence=np.array([-1, -1] if self.convergenceStep is None else [self.convergenceYear, self.convergenceStep]), convergenceRatio=self.convergenceRatio)
+
+    def loadState(self, path):
+        state = np.load(path)
+        if not np.array_equal(state["parameters"], np.array(self.getStateParameters())):
+            raise ValueError("Checkpoint {} was saved with different GeoSystem parameters.".format(path))
+
+        self.stepIndex = int(state["stepIndex"])
+        self.numberOfDays = int(state["numberOfDays"])
+        self.numberOfTimeStep = int(self.numberOfDays / self.timeStep)
+        self.liveTempMatrix = state["liveTempMatrix"]
+        self.groundTemp = state["groundTemp"] if state["groundTemp"].size else None
+        self.dailyTmoList = state["dailyTmoList"]
+        self.TmiList = state["TmiList"].tolist()
+        self.TmoList = state["TmoList"].tolist()
+        self.WPac = state["WPac"].tolist()
+        self.copList = state["copList"].tolist()
+        self.Qpac = state["Qpac"]
+        self.annualQpac = state["annualQpac"]
+        self.dailyTemperatureVariation = state["dailyTemperatureVariation"]
+        self.firstNodeTempList = state["firstNodeTempList"].tolist()
+        self.convergenceYear, self.convergenceStep = [None if value < 0 else int(value) for value in state["convergence"]]
+        self.convergenceRatio = float(state["convergenceRatio"])
+        self.stepQpac = self.stepWPac = self.stepCopList = None
+
+    def getStateParameters(self):
+        return list(self.getOperatorKey()) + [self.T0, self.tmiBlock, self.numberOfWell, self.wellDepth, self.wellDistanceStep, self.mdotTotal, self.totalLineicResistance]
 
     # ===== CALCULATING FUNCTIONS  ====
 
     def averageQpac(self):
-        self.Qpac = np.resize(self.heater.QPac, (int(self.heater.QPac.shape[0]/self.timeStep),self.timeStep))
+        samplesPerStep = self.timeStep * self.pool.samplesPerDay # échantillons de la charge par pas de temps (journaliers, ou horaires avec une source météo)
+        self.Qpac = np.resize(self.heater.QPac, (int(self.heater.QPac.shape[0]/samplesPerStep),samplesPerStep))
         self.Qpac = np.average(self.Qpac,1)
 
     def expandWpacQpacCop(self):
-        self.Qpac = np.repeat(self.Qpac,self.timeStep)
-        self.WPac = np.repeat(self.WPac, self.timeStep)
-        self.copList = np.repeat(self.copList, self.timeStep)
-
+        # retour à la résolution de la charge: la PAC fournit la moyenne du pas, l'échangeur à vapeur couvre les pointes
+        samplesPerStep = self.timeStep * self.pool.samplesPerDay
+        self.stepQpac, self.stepWPac, self.stepCopList = np.array(self.Qpac), np.array(self.WPac), list(self.copList)
+        self.Qpac = np.repeat(self.Qpac,samplesPerStep)
+        self.WPac = np.repeat(self.WPac, samplesPerStep)
+        self.copList = np.repeat(self.copList, samplesPerStep)
+
+    @timed("GeoSystem.buildCoefficientsMatrix")
     def buildCoefficientsMatrix(self):
-        firstRow = self.buildFirstRowCoeffMatrix() # création da la première ligne de la matrice des coefficients (pour le premier noeud)
-        lastRow = self.buildLastRowCoeffMatrix() # création da la dernière ligne de la matrice des coefficients (pour le dernier noeud)
-        for i in range(self.numberOfNodes): # boucle permettant de créer toute la matrice tridiagonale selon les équations du document complément
-            for j in range(self.numberOfNodes):
-                if i == j:  # Au noeud i
-                    self.coeffMatrix[i, j] = np.round(self.groundrhocp / self.timeStepSecond + (2 * self.groundConductivity) / (self.distanceStep ** 2), 6)
-                if i == j + 1:  # Au noeud i-1
-                    self.coeffMatrix[i, j] = -np.round((self.groundConductivity * ((i + 1) * self.distanceStep - (self.distanceStep / 2))) / ((i + 1) * self.distanceStep * self.distanceStep ** 2), 6)
-                if i == j - 1:  # Au noeud i+1
-                    self.coeffMatrix[i, j] = -np.round((self.groundConductivity * ((i + 1) * self.distanceStep + (self.distanceStep / 2))) / ((i + 1) * self.distanceStep * self.distanceStep ** 2), 6)
-        self.coeffMatrix[0, :] = firstRow
-        self.coeffMatrix[-1, :] = lastRow
-        return np.round(self.coeffMatrix, 6)
-
-    def buildFirstRowCoeffMatrix(self):
-        firstCoeff = [(self.groundrhocp / self.timeStepSecond) + (2 * self.groundConductivity * (self.ductRadius + (self.distanceStep / 2))) /(self.ductRadius * self.distanceStep ** 2),- (2 * self.groundConductivity * (self.ductRadius + (self.distanceStep / 2))) / (self.ductRadius * self.distanceStep ** 2)] # selon l'équation du document de complément pour la première ligne
-        listOfZeros = [0 for i in range(self.numberOfNodes - 2)] # formattage
-        return np.round(np.concatenate((firstCoeff, listOfZeros)), 6)
-
-    def buildLastRowCoeffMatrix(self):
-        lastCoeff = [1] # condiion limites (pour obtenir 283 au dernier noeud)
-        listOfZeros = [0 for i in range(self.numberOfNodes - 1)] # formattage
-        return np.concatenate((listOfZeros, lastCoeff))
-
+        if self.solver not in ("tridiagonal", "dense"):
+            raise ValueError("Unknown solver '{}', expected 'tridiagonal' or 'dense'.".format(self.solver))
+
+        if self.radialGrid not in ("uniform", "stretched"):
+            raise ValueError("Unknown radialGrid '{}', expected 'uniform' or 'stretched'.".format(self.radialGrid))
+        if self.radialGrid == "stretched" and (self.nodeRadius is None or self.stepIndex == 0): # grille fixée pour toute la simulation (et ses prolongations)
+            self.nodeRadius = self.buildStretchedGrid()
+            self.numberOfNodes = len(self.nodeRadius)
+        if self.stepIndex == 0:
+            self.liveTempMatrix = np.full((self.numberOfNodes, 1), (self.T0 * (self.groundrhocp / self.timeStepSecond)))
+
+        self.tridiagonalSolver = operatorCache.get(self.getOperatorKey(), self.buildCoefficientsDiagonals) # une seule factorisation par grille
+        if self.solver == "dense":
+            self.coeffMatrix = self.tridiagonalSolver.toDense()
+        return self.tridiagonalSolver
+
+    def getOperatorKey(self, timeStep=None):
+        key = (self.distanceStep, self.numberOfNodes, self.timeStep if timeStep is None else timeStep, self.groundConductivity, self.groundrhocp, self.ductRadius)
+        if self.radialGrid == "stretched":
+            nodeRadius = self.nodeRadius if self.nodeRadius is not None and self.stepIndex > 0 else self.buildStretchedGrid()
+            key = (len(nodeRadius), self.timeStep if timeStep is None else timeStep, self.groundConductivity, self.groundrhocp, self.ductRadius, self.firstDistanceStep, self.gridStretchFactor, nodeRadius[-1])
+        return key
+
+    def buildStretchedGrid(self):
+        # pas croissant géométriquement depuis la paroi du conduit jusqu'à la profondeur de pénétration thermique de la simulation
+        outerRadius = min(self.ductRadius + self.farFieldFactor * m.sqrt(self.groundDiffusivity * self.numberOfDays * 3600 * 24), self.numberOfMeters)
+        nodeRadius = [self.ductRadius]
+        step = self.firstDistanceStep
+        while nodeRadius[-1] < outerRadius:
+            nodeRadius.append(min(nodeRadius[-1] + step, outerRadius))
+            step *= self.gridStretchFactor
+        return np.array(nodeRadius)
+
+    def getBoundaryFactor(self):
+        # volume par mètre de puits du premier noeud, divisé par 2 (flux linéique [W/m] -> terme source de la première ligne)
+        if self.radialGrid == "stretched":
+            return m.pi * (((self.nodeRadius[0] + self.nodeRadius[1]) / 2) ** 2 - self.nodeRadius[0] ** 2)
+        return m.pi * self.ductRadius * self.distanceStep
+
+    def buildCoefficientsDiagonals(self, timeStep=None):
+        # matrice tridiagonale selon les équations du document complément, construite directement par diagonales
+        timeStepSecond = self.timeStepSecond if timeStep is None else timeStep * 3600 * 24 # autre pas de temps pour les grands pas adaptatifs
+        if self.radialGrid == "stretched":
+            return self.buildStretchedDiagonals(timeStepSecond)
+        nodeRadius = np.arange(1, self.numberOfNodes + 1) * self.distanceStep # rayon (i + 1) * dr du noeud i
+        diagonal = np.full(self.numberOfNodes, np.round(self.groundrhocp / timeStepSecond + (2 * self.groundConductivity) / (self.distanceStep ** 2), 6)) # Au noeud i
+        lower = -np.round((self.groundConductivity * (nodeRadius[1:] - (self.distanceStep / 2))) / (nodeRadius[1:] * self.distanceStep ** 2), 6) # Au noeud i-1
+        upper = -np.round((self.groundConductivity * (nodeRadius[:-1] + (self.distanceStep / 2))) / (nodeRadius[:-1] * self.distanceStep ** 2), 6) # Au noeud i+1
+
+        diagonal[0], upper[0] = self.buildFirstRowCoeffMatrix(timeStepSecond) # premier noeud
+        diagonal[-1], lower[-1] = 1, 0 # condition limite (pour obtenir 283 au dernier noeud)
+        return TridiagonalSolver(lower, diagonal, upper)
+
+    def buildStretchedDiagonals(self, timeStepSecond):
+        # volumes finis sur la grille étirée: chaque noeud échange avec ses voisins à travers les faces à mi-distance
+        faceRadius = (self.nodeRadius[:-1] + self.nodeRadius[1:]) / 2
+        volume = np.diff(np.concatenate(([self.nodeRadius[0]], faceRadius)) ** 2) / 2 # volume / (2 pi) de chaque noeud (sauf le dernier)
+        conductance = self.groundConductivity * faceRadius / np.diff(self.nodeRadius) # à travers chaque face / (2 pi)
+
+        diagonal = np.ones(self.numberOfNodes) # condition limite (pour obtenir 283 au dernier noeud)
+        diagonal[:-1] = np.round(self.groundrhocp / timeStepSecond + (conductance + np.concatenate(([0], conductance[:-1]))) / volume, 6)
+        upper = -np.round(conductance / volume, 6)
+        lower = np.zeros(self.numberOfNodes - 1)
+        lower[:-1] = -np.round(conductance[:-1] / volume[1:], 6)
+        return TridiagonalSolver(lower, diagonal, upper)
+
+    def buildFirstRowCoeffMatrix(self, timeStepSecond=None):
+        if timeStepSecond is None:
+            timeStepSecond = self.timeStepSecond
+        firstCoeff = [(self.groundrhocp / timeStepSecond) + (2 * self.groundConductivity * (self.ductRadius + (self.distanceStep / 2))) /(self.ductRadius * self.distanceStep ** 2),- (2 * self.groundConductivity * (self.ductRadius + (self.distanceStep / 2))) / (self.ductRadius * self.distanceStep ** 2)] # selon l'équation du document de complément pour la première ligne
+        return np.round(firstCoeff, 6)
+
+    @timed("GeoSystem.solveTempForNextTime")
     def solveTempForNextTime(self, liveTempMatrix):
-        tempNextTimeMatrix = np.linalg.solve(self.coeffMatrix, liveTempMatrix)
+        if self.solver == "dense":
+            tempNextTimeMatrix = np.linalg.solve(self.coeffMatrix, liveTempMatrix)
+        else:
+            tempNextTimeMatrix = self.tridiagonalSolver.solve(liveTempMatrix)
         return np.round(tempNextTimeMatrix, 5)
 
-    def storeTempData(self, tempMatrix, absoluteTime):
-        self.motherMatrix[:, absoluteTime] = tempMatrix[:, 0]
+    def allocateHistory(self):
+        stride = self.historyStride if self.historyStorage == "strided" else 1
+        self.historyTimes = np.arange(0, self.numberOfTimeStep, stride)
+        self.historyNodeIndices = np.array(self.historyNodes) if self.historyStorage == "nodes" else np.arange(self.numberOfNodes)
+        shape = (len(self.historyNodeIndices), len(self.historyTimes))
+
+        if self.historyStorage in ("full", "strided", "nodes"):
+            self.motherMatrix = np.zeros(shape)
+        elif self.historyStorage == "memmap":
+            if self.historyFile is None:
+                with tempfile.NamedTemporaryFile(prefix="motherMatrix-", suffix=".dat", delete=False) as file:
+                    pass
+                self.motherMatrix = np.memmap(file.name, dtype=np.float64, mode="w+", shape=shape)
+                weakref.finalize(self.motherMatrix, os.remove, file.name) # fichier temporaire effacé avec sa matrice (ou à la sortie)
+            else:
+                self.motherMatrix = np.memmap(self.historyFile, dtype=np.float64, mode="w+", shape=shape)
+        elif self.historyStorage == "none":
+            self.motherMatrix = None
+            self.historyTimes = np.array([], dtype=int)
+            self.historyNodeIndices = np.array([], dtype=int)
+        else:
+            raise ValueError("Unknown historyStorage '{}', expected 'full', 'strided', 'nodes', 'memmap' or 'none'.".format(self.historyStorage))
+
+    def extendHistory(self, oldNumberOfTimeStep):
+        oldHistory, oldTimes = self.motherMatrix, self.historyTimes
+        if oldHistory is not None:
+            oldHistory = np.array(oldHistory) # copie en mémoire (le fichier memmap est recréé à la nouvelle taille)
+        self.allocateHistory()
+        if oldHistory is not None:
+            self.motherMatrix[:, :len(oldTimes)] = oldHistory
 
+    def storeTempData(self, tempMatrix, absoluteTime):
+        if self.motherMatrix is None:
+            return
+        if self.historyStorage == "strided":
+            if absoluteTime % self.historyStride == 0:
+                self.motherMatrix[:, absoluteTime // self.historyStride] = tempMatrix[:, 0]
+        elif self.historyStorage == "nodes":
+            self.motherMatrix[:, absoluteTime] = tempMatrix[self.historyNodeIndices, 0]
+        else:
+            self.motherMatrix[:, absoluteTime] = tempMatrix[:, 0]
+
+    def flushHistory(self):
+        if isinstance(self.motherMatrix, np.memmap):
+            self.motherMatrix.flush()
+
+    def getNodeHistory(self, node):
+        rows = np.where(self.historyNodeIndices == node)[0]
+        if len(rows) == 0:
+            raise ValueError("Node {} was not kept with historyStorage = '{}'.".format(node, self.historyStorage))
+        return self.historyTimes, self.motherMatrix[rows[0], :]
+
+    @timed("GeoSystem.calculateTmoList")
     def calculateTmoList(self, Tmi, wellDepth, depthStep, Tsol):
-        dailyTmoList = [0 for i in range(int(2*wellDepth / depthStep))]
-        for i in range(int(2*wellDepth / depthStep)):
-            dailyTmoList[i] = np.round(((np.round(Tsol, 6)-np.round(Tmi, 6))/(self.totalLineicResistance * (self.mdotTotal/self.numberOfWell) * self.calorificLiquid["Cp"][self.chosenCalorificLiquid]))*depthStep + Tmi, 6)
-
-            if Tsol-Tmi <= 10**(-4): # mise à zéro pour éviter les erreurs numériques
-                Tmi = Tsol
-            if dailyTmoList[i] >= Tsol: # bloquage de la température pour empêché de dépassement numériques
-                dailyTmoList[i] = Tsol
-                Tmi = dailyTmoList[i]
-            else:
-                Tmi = dailyTmoList[i]
-        return dailyTmoList
+        return calculateTmoProfile(Tmi, Tsol, self.getTmoDecayFactor(depthStep), int(2*wellDepth / depthStep))
+
+    def getTmoDecayFactor(self, depthStep):
+        # fraction de l'écart (Tsol - T) du liquide qui subsiste après chaque segment de puits de longueur depthStep
+        return 1 - depthStep / (self.totalLineicResistance * (self.mdotTotal/self.numberOfWell) * self.calorificLiquid["Cp"][self.chosenCalorificLiquid])
 
     def calculateCOP(self, Tmi):
         cop = 1 + 5*((Tmi-271)/12)
@@ -227,59 +636,28 @@ class GeoSystem:
      #===== GRAPHIC DISPLAY FUNCTIONS  ========
 
     def graphOneNodeAtAllTime(self, x):
-        plt.plot(range(self.numberOfTimeStep), self.motherMatrix[x, :])
-        plt.title("Temperature of node #{} for all {} days.".format(x, self.numberOfDays))
-        plt.xlabel("[Days]")
-        plt.ylabel("Temperature [°K]")
-        plt.show()
+        from reporting import graphOneNodeAtAllTime
+        graphOneNodeAtAllTime(self, x)
 
     def graphTmoTmiAtAllTime(self):
-        plt.plot(range(len(self.TmoList)), self.TmoList, 'k', label="Tmo")
-        plt.plot(range(len(self.TmiList)), self.TmiList, 'r', label="Tmi")
-        plt.title("Temperature of Calorific Liquid for all days")
-        plt.legend()
-        plt.xlabel("[Days]")
-        plt.ylabel("Temperature [°K]")
-        plt.show()
+        from reporting import graphTmoTmiAtAllTime
+        graphTmoTmiAtAllTime(self)
 
     def graphQSystems(self):
-        plt.plot(range(len(self.Qpac)), self.heater.QVaporEx/1000, 'k', label="QVapor")
-        plt.plot(range(len(self.Qpac)), self.heater.QWaterEx/1000, 'r', label="QWater")
-        # plt.plot(range(len(self.Qpac)), self.heater.QPac/1000 - self.Qpac/1000, 'b', label="QVapor")
-        plt.legend(loc=1)
-        plt.title('Q of systems')
-        plt.xlabel("[Days]")
-        plt.ylabel("Heat [kW]")
-        plt.show()
+        from reporting import graphQSystems
+        graphQSystems(self)
 
     def graphSuperpositionProfiles(self):
-        for i in range(self.numberOfTimeStep-10):
-            plt.plot(range(self.numberOfNodes), self.motherMatrix[:, i])
-        plt.title("Profile Evolution")
-        plt.xlabel("[Meters]")
-        plt.ylabel("Temperature [°K]")
-        plt.show()
+        from reporting import graphSuperpositionProfiles
+        graphSuperpositionProfiles(self)
 
     def graphWPACAllTime(self):
-        fig, ax1 = plt.subplots()
-        ax1.set_xlabel("Days")
-        ax1.plot(range(len(self.WPac)), self.WPac/1000, 'b', label="WPac")
-        ax2 = ax1.twinx()
-        ax2.plot(range(len(self.copList)), self.copList, 'r', label="COP")
-        ax1.legend(loc=1)
-        ax2.legend(loc=2)
-        plt.title("PAC Informations")
-        ax2.set_ylabel("COP")
-        ax1.set_ylabel("Wpac [kW]")
-        plt.show()
+        from reporting import graphWPACAllTime
+        graphWPACAllTime(self)
 
     def graphSuperpositionNodes(self):
-        for i in range(self.numberOfNodes):
-            plt.plot(range(self.numberOfTimeStep - 10), self.motherMatrix[i, 0:self.numberOfTimeStep - 10])
-        plt.title("Nodes Temperature Variation")
-        plt.xlabel("[Days]")
-        plt.ylabel("Temperature [°K]")
-        plt.show()
+        from reporting import graphSuperpositionNodes
+        graphSuperpositionNodes(self)
 
     def printSimulationVariableParameters(self):
         print("\n ==================================================")
@@ -288,10 +666,17 @@ class GeoSystem:
         print("Simulation Time: {} Days".format(self.numberOfDays))
         print("Step Time: {} Days/Step".format(self.timeStep))
         print("Simulation Distance: {} Meters".format(self.numberOfMeters))
-        print("Step Distance: {} Meters/Step".format(self.distanceStep))
+        if self.radialGrid == "stretched":
+            print("Stretched Radial Grid: {} Nodes up to {:.1f} Meters (first step {} Meters, ratio {})".format(self.numberOfNodes, self.nodeRadius[-1] - self.ductRadius, self.firstDistanceStep, self.gridStretchFactor))
+        else:
+            print("Step Distance: {} Meters/Step".format(self.distanceStep))
         print("Well Depth: {} Meters".format(self.wellDepth))
         print("Number Of Wells: {} ".format(self.numberOfWell))
         print("Well Resolution for Tmo Calculation: {} Meters".format(self.wellDistanceStep))
+        print("Ground Solver: {}".format(self.solver))
+        print("Ground Engine: {}".format(self.engine))
+        print("Adaptive Time Step: {} (max {} Steps)".format(self.adaptiveTimeStep, self.adaptiveMaxStep))
+        print("Ground Temperature History: {}".format(self.historyStorage))
         print("Calorific Liquid Nature: {}".format(self.calorificLiquid["Nature"][self.chosenCalorificLiquid]))
         print("Calorific Liquid Speed: {} m/s".format(self.calorificLiquid["Speed"][self.chosenCalorificLiquid]))
         print("Calorific Liquid Density: {} kg/m^3".format(self.calorificLiquid["Density"][self.chosenCalorificLiquid]))
@@ -308,7 +693,24 @@ class GeoSystem:
         print(" ==================================================")
         print("Calorific Liquid Lowest Hot : {} °K".format(min(self.TmoList)))
         print("Calorific Liquid Lowest Cold : {} °K".format(min(self.TmiList)))
-        print("Ground 1st Node Lowest Temperature: {} °K".format(min(self.motherMatrix[0, :])))
+        if self.adaptiveTimeStep:
+            print("Adaptive Large Steps: {}".format(self.macroStepCount))
+        if self.convergenceYear is not None:
+            print("Periodic Steady State Reached After Year: {}".format(self.convergenceYear))
+        if 0 in self.historyNodeIndices:
+            print("Ground 1st Node Lowest Temperature: {} °K".format(min(self.getNodeHistory(0)[1])))
+
+
+@timed("calculateTmoProfile")
+def calculateTmoProfile(Tmi, Tsol, decayFactor, numberOfSegments):
+    # Propagation du liquide dans le puits en U: à chaque segment, T += (Tsol - T) * (1 - decayFactor),
+    # donc l'écart au sol décroît géométriquement: Tsol - Tmo[k] = (Tsol - Tmi) * decayFactor ** (k + 1).
+    # Tmi, Tsol et decayFactor peuvent être des tableaux (un profil par système, dernier axe = profondeur).
+    # L'ancienne boucle arrondissait à 6 décimales à chaque segment; sans cet arrondi, les coûts bougent de quelques cents (jusqu'à 0.04 $).
+    Tmi, Tsol, decayFactor = np.asarray(Tmi, dtype=float), np.asarray(Tsol, dtype=float), np.asarray(decayFactor, dtype=float)
+    gaps = (Tsol - Tmi)[..., np.newaxis] * decayFactor[..., np.newaxis] ** np.arange(1, numberOfSegments + 1)
+    gaps[np.logical_or.accumulate(gaps < 0, axis=-1)] = 0 # bloquage à Tsol dès que le liquide atteint (ou dépasse) la température du sol
+    return np.round(Tsol[..., np.newaxis] - gaps, 6)
 
 
 if __name__ == '__main__':
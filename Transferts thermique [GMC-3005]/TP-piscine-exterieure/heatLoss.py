@@ -1,9 +1,63 @@
 import numpy as np
-import matplotlib.pyplot as plt
+from timing import timed
+from pricing import defaultPrices
+
+# Loss components of Pool, in computation order, with the inputs and components each one depends on.
+# Setting an input marks the components that depend on it (directly or not) as out of date; Pool.update then
+# recomputes only those.
+lossDependencies = {
+    "airTemp": ["timeVector", "weather", "weatherYear", "weatherYears"],
+    "poolTemp": ["airTemp", "summerTempThreshold", "winterTemp", "summerTemp", "summerAirTemp"],
+    "QEvap": ["airTemp", "poolTemp", "relativeHumidity", "hmAir", "surfaceArea", "nightCover", "coverReduction", "vaporEnthalpy"],
+    "QWaterInput": ["QEvap", "poolTemp"],
+    "QSurfaces": ["airTemp", "poolTemp", "insulationThickness", "hAirTop", "hAirWalls", "surfaceArea", "sideArea", "nightCover", "coverReduction"],
+    "QRadiation": ["poolTemp"],
+    "heatLoss": ["QEvap", "QWaterInput", "QSurfaces"],
+    "cost": ["insulationThickness", "sideArea", "nightCover"],
+}
+lossMethods = {"airTemp": "setAirTemp", "poolTemp": "setPoolTemp", "QEvap": "getQEvap", "QWaterInput": "getQWaterInput", "QSurfaces": "getQSurfaces",
+               "QRadiation": "getQRadiation", "heatLoss": "sumHeatLoss", "cost": "getCost"}
+trackedInputs = sorted({name for dependencies in lossDependencies.values() for name in dependencies} - set(lossDependencies))
+
+
+def getStaleComponents(name):
+    # every component depending on name, directly or through other components
+    stale, pending = set(), [name]
+    while pending:
+        dependency = pending.pop()
+        for component, dependencies in lossDependencies.items():
+            if dependency in dependencies and component not in stale:
+                stale.add(component)
+                pending.append(component)
+    return stale
+
+
+staleComponentsOf = {name: getStaleComponents(name) for name in trackedInputs}
+
+
+class TrackedInput:
+    # Pool input kept in the instance dict under its own name (so vars(pool) is unchanged); setting it invalidates its dependents
+    def __init__(self, name):
+        self.name = name
+
+    def __get__(self, pool, owner=None):
+        if pool is None:
+            return self
+        try:
+            return pool.__dict__[self.name]
+        except KeyError:
+            raise AttributeError(self.name) from None
+
+    def __set__(self, pool, value):
+        pool.__dict__[self.name] = value
+        pool.staleComponents |= staleComponentsOf[self.name]
 
 
 class Pool:
     def __init__(self, summerTemp=23, winterTemp=36, tempThreshold=20, insulationThickness=0):
+        self.staleComponents = set(lossDependencies)  # components to (re)compute by update
+        self.recomputeCounts = dict.fromkeys(lossDependencies, 0)
+
         self.summerTemp = summerTemp  # celsius
         self.winterTemp = winterTemp  # celsius
         self.summerDays = []
@@ -12,7 +66,7 @@ class Pool:
         self.insulationPrice = 0
         self.surfaceArea = 200  # m^2
         self.sideArea = 90  # m^2
-        self.windVelocity = 3  # m/s
+        self.windVelocity = 3  # m/s (not used by the model: hAirTop, hAirWalls and hmAir are constants)
         self.relativeHumidity = 0.5
 
         self.summerOff = True
@@ -23,6 +77,14 @@ class Pool:
         self.coverReduction = 0.5 * 8/24
         self.standAlone = False
 
+        self.weather = None  # weather.WeatherSource: its record (e.g. hourly) replaces the sinusoid, the constant wind and humidity
+        self.weatherYear = 0  # first year of the record simulated, or "mean": the mean of its complete years as a single year
+                              # (smooths the hourly extremes that size the vapor exchanger)
+        self.weatherYears = 1  # consecutive years of the record covered by the loss arrays (starting over at its first year when it is shorter)
+        self.weatherKey = None  # digest of the weather data used (part of the result cache key)
+        self.samplesPerDay = 1  # samples of the loss arrays per day (1 with the sinusoid, weather.samplesPerDay otherwise)
+        self.numberOfYears = 1  # years covered by the loss arrays (weatherYears with a weather record), repeated over the heater horizon
+
         self.hAirTop = 6.61  # W/(m^2 K)
         self.hAirWalls = 6.75  # W/(m^2 K)
         self.hmAir = 6.4133  # m/s
@@ -42,40 +104,55 @@ class Pool:
         self.QTop = None
         self.QWalls = None
         self.QRadiation = None
+        self.QSurfaces = None  # QTop + QWalls
 
+    @timed("Pool.getTotalLoss")
     def getTotalLoss(self):
-        self.setAirTemp()
-        self.setPoolTemp()
-
-        self.getQEvap()
-        self.getQWaterInput()
-        self.getQSurfaces()
-        self.getQRadiation()
-
-        self.getCost()
+        self.update()
         if self.standAlone:
             self.printStats()
             self.setPlot()
 
     def getLocalLoss(self):
-        self.heatLoss = 0
-
-        self.getQEvap()
-        self.getQWaterInput()
-        self.getQSurfaces()
-        self.getQRadiation()
-
+        self.update()
         return self.heatLoss
 
+    def update(self):
+        # recomputes, in dependency order, the components whose inputs changed since they were last computed
+        for component in lossDependencies:
+            if component in self.staleComponents:
+                getattr(self, lossMethods[component])()
+                self.staleComponents.discard(component)
+                self.recomputeCounts[component] += 1
+
     def setAirTemp(self):
-        self.airTemp = 6.4 + 29.5 * np.sin(1.5 * np.pi + 2 * np.pi * self.timeVector / 365)
+        if self.weather is None:
+            self.numberOfYears = 1
+            self.airTemp = 6.4 + 29.5 * np.sin(1.5 * np.pi + 2 * np.pi * self.timeVector / 365)
+            return
+
+        self.samplesPerDay = self.weather.samplesPerDay
+        if self.weatherYear == "mean":
+            self.numberOfYears = 1
+            self.weatherKey = self.weather.getKey(None)
+            self.airTemp, self.windVelocity, self.relativeHumidity = self.weather.getYear(None)
+        else:
+            self.numberOfYears = self.weatherYears
+            self.weatherKey = self.weather.getKey(self.weatherYear, self.weatherYears)
+            self.airTemp, self.windVelocity, self.relativeHumidity = self.weather.getYears(self.weatherYear, self.weatherYears)
+        self.timeVector = np.arange(365 * self.numberOfYears * self.samplesPerDay) / self.samplesPerDay  # days
+
+    def getSummerMask(self):
+        # summer operation is decided on the daily mean air temperature, for every sample of the day
+        dailyAirTemp = np.mean(np.reshape(self.airTemp, (-1, self.samplesPerDay)), axis=1)
+        return np.repeat(dailyAirTemp > self.summerTempThreshold, self.samplesPerDay, axis=-1)
 
     def setPoolTemp(self):
-        self.summerDays = np.where(self.airTemp > self.summerTempThreshold)[0]
+        self.summerDays = np.where(self.getSummerMask())[0]  # indices of the summer samples
         if self.standAlone:
-            print("Summer Pool for {} days a year.".format(len(self.summerDays)))
+            print("Summer Pool for {} days a year.".format(len(self.summerDays) // self.samplesPerDay // self.numberOfYears))
 
-        self.poolTemp = np.ones(365) * self.winterTemp
+        self.poolTemp = np.ones(np.shape(self.airTemp)) * self.winterTemp
 
         if self.summerAirTemp:
             self.poolTemp[self.summerDays] = self.airTemp[self.summerDays]
@@ -89,11 +166,9 @@ class Pool:
 
         self.evapMassRate = self.hmAir * self.surfaceArea * (surfaceSatVapor - airVapor)  # kg/s
 
-        if self.nightCover:
-            self.evapMassRate *= 1 - self.coverReduction
+        self.evapMassRate *= np.where(self.nightCover, 1 - self.coverReduction, 1)
 
         self.QEvap = self.evapMassRate * self.vaporEnthalpy
-        self.heatLoss += self.QEvap
 
     def getSatVaporAt(self, temp):
         return 1.9747*10**(-5)*temp**2 + 1.3257*10**(-4)*temp + 3.9866*10**(-3)
@@ -101,19 +176,16 @@ class Pool:
     def getQWaterInput(self):
         coldWaterCp = 4.198  # kJ/(kg K) at 7 celsius
         self.QWaterInput = self.evapMassRate * coldWaterCp * (self.poolTemp - 7)
-        self.heatLoss += self.QWaterInput
 
     def getQSurfaces(self):
         kGlass = 0.8  # W/mK
         kInsulation = 0.05  # W/mK
 
         resTop = 1 / (self.hAirTop * self.surfaceArea)
-        if self.nightCover:
-            resTop *= 1 + self.coverReduction
+        resTop *= np.where(self.nightCover, 1 + self.coverReduction, 1)
 
         resWalls = 0.015/kGlass + 1/self.hAirWalls
-        if self.insulationThickness != 0:
-            resWalls += self.insulationThickness/kInsulation
+        resWalls += self.insulationThickness/kInsulation
 
         resWalls /= self.sideArea
         resSum = resWalls + resTop
@@ -123,48 +195,84 @@ class Pool:
 
         self.QTop = qTotal * (1 - resTop/resSum)
         self.QWalls = qTotal * (1 - resWalls/resSum)
-        self.heatLoss += qTotal
+        self.QSurfaces = qTotal
 
     def getQRadiation(self):
-        self.QRadiation = np.ones(365)
+        self.QRadiation = np.ones(np.shape(self.poolTemp))
         self.QRadiation *= -8500
 
+    def sumHeatLoss(self):
+        self.heatLoss = np.zeros(np.shape(self.QSurfaces))
+        self.heatLoss += self.QEvap
+        self.heatLoss += self.QWaterInput
+        self.heatLoss += self.QSurfaces
+
     def printStats(self):
-        totalAnnualLoss = np.round(np.sum(self.heatLoss)*24/1000, 1)
+        totalAnnualLoss = np.round(np.sum(self.heatLoss)*24/self.samplesPerDay/self.numberOfYears/1000, 1)
         print("Total Heat Loss per year = {} kWh\n".format(totalAnnualLoss))
 
         for QLoss, label in zip([self.QEvap, self.QWaterInput, self.QTop, self.QWalls, self.QRadiation], ["Evap", "WaterInput", "Top surface", "Walls", "Radiation"]):
-            annualLoss = np.round(np.sum(QLoss)*24/1000, 1)
+            annualLoss = np.round(np.sum(QLoss)*24/self.samplesPerDay/self.numberOfYears/1000, 1)
             print("Q{} per year = {} kWh  ({}%)".format(label, annualLoss, np.round(annualLoss/totalAnnualLoss*100, 1)))
 
     def setPlot(self):
-        self.fig, [self.tempPlot, self.heatPlot] = plt.subplots(2)
-        self.tempPlot.datas, self.tempPlot.labels = [self.airTemp, self.poolTemp], ["Air", "Piscine"]
-        self.heatPlot.datas, self.heatPlot.labels = [self.heatLoss, self.QEvap, self.QWaterInput, self.QTop, self.QWalls, self.QRadiation], ["Total", "Évaporation", "Remplissage", "Surface", "Murs", "Rayonnement"]
-
-        for i, graph in enumerate([self.tempPlot, self.heatPlot]):
-            for data, label in zip(graph.datas, graph.labels):
-                if i == 0:
-                    graph.set_title("Températures au cours de l'année")
-                    graph.plot(self.timeVector, data, label=label)
-                    graph.set_ylabel("T [$\degree$C]")
-                else:
-                    graph.set_title("Bilan des pertes thermiques annuelles")
-                    graph.plot(self.timeVector, data/1000, label="{} ({}%)".format(label, np.round(100*np.sum(data)/np.sum(self.heatLoss), 1)))
-                    graph.set_ylabel("$q$ [kW]")
-
-            graph.set_xlabel("Jours")
-            graph.legend(loc="best")
-            graph.set_xlim(0, 365)
+        from reporting import plotPool
+        plotPool(self)
 
     def getCost(self):
         insulationVolume = self.sideArea*self.insulationThickness  # m^3
-        self.insulationPrice = np.round(insulationVolume*100, 2)
-        self.nightCoverCost = self.nightCover*50
+        self.insulationPrice = np.round(insulationVolume*defaultPrices["insulation"], 2)
+        self.nightCoverCost = self.nightCover*defaultPrices["nightCover"]
 
         if self.standAlone:
             print("\nInsulation : {} m^3 => {} $".format(insulationVolume, self.insulationPrice))
 
     def showPlot(self):
-        plt.tight_layout()
-        plt.show()
+        from reporting import showPlot
+        showPlot()
+
+
+class PoolBatch(Pool):
+    # Many pool scenarios in one vectorized pass. Each parameter is a scalar or an array over the scenarios (broadcast
+    # together); the Pool methods then compute every loss component as a (scenarios x days) array.
+    def __init__(self, insulationThickness=0, winterTemp=36, tempThreshold=20, summerTemp=23, windVelocity=3, relativeHumidity=0.5, nightCover=True):
+        Pool.__init__(self)
+        names = ["insulationThickness", "winterTemp", "summerTempThreshold", "summerTemp", "windVelocity", "relativeHumidity", "nightCover"]
+        values = np.broadcast_arrays(*[np.atleast_1d(value) for value in (insulationThickness, winterTemp, tempThreshold, summerTemp, windVelocity, relativeHumidity, nightCover)])
+        self.parameters = dict(zip(names, values))  # one value per scenario
+        self.numberOfScenarios = len(values[0])
+        for name, value in self.parameters.items():
+            setattr(self, name, value[:, np.newaxis])  # column: broadcast against the days
+        self.summerMask = None
+
+    def setPoolTemp(self):
+        self.summerMask = self.getSummerMask()  # scenarios x samples
+        self.summerDays = [np.where(mask)[0] for mask in self.summerMask]
+        self.poolTemp = np.ones(self.summerMask.shape) * self.winterTemp
+        self.poolTemp = np.where(self.summerMask, self.airTemp if self.summerAirTemp else self.summerTemp, self.poolTemp)
+
+    def getPools(self):
+        # one computed Pool per scenario, as Pool.getTotalLoss would give it (for Heater and GeoSystem)
+        pools = []
+        for i in range(self.numberOfScenarios):
+            parameters = {name: value[i].item() for name, value in self.parameters.items()}
+            pool = Pool(parameters["summerTemp"], parameters["winterTemp"], parameters["summerTempThreshold"], parameters["insulationThickness"])
+            pool.windVelocity, pool.relativeHumidity, pool.nightCover = parameters["windVelocity"], parameters["relativeHumidity"], parameters["nightCover"]
+            pool.summerOff, pool.summerAirTemp = self.summerOff, self.summerAirTemp
+            pool.weather, pool.weatherYear, pool.weatherYears, pool.weatherKey, pool.samplesPerDay = self.weather, self.weatherYear, self.weatherYears, self.weatherKey, self.samplesPerDay
+            pool.numberOfYears = self.numberOfYears
+            if self.weather is not None:
+                pool.timeVector, pool.windVelocity, pool.relativeHumidity = self.timeVector.copy(), self.windVelocity.copy(), self.relativeHumidity.copy()
+
+            pool.airTemp = self.airTemp.copy()
+            pool.summerDays = self.summerDays[i]
+            for name in ("poolTemp", "evapMassRate", "QEvap", "QWaterInput", "QTop", "QWalls", "QSurfaces", "QRadiation", "heatLoss"):
+                setattr(pool, name, getattr(self, name)[i].copy())
+            pool.staleComponents = {"cost"}  # losses copied from the batch
+            pool.update()
+            pools.append(pool)
+        return pools
+
+
+for name in trackedInputs:
+    setattr(Pool, name, TrackedInput(name))
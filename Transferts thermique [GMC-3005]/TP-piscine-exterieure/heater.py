@@ -1,5 +1,7 @@
 import numpy as np
-import itertools
+from periodic import PeriodicArray
+from timing import timed
+from pricing import defaultPrices, priceSystems, getPhysicalOutputs
 
 
 class Heater:
@@ -12,13 +14,19 @@ class Heater:
         self.waterExArea = waterExArea  # m^2
         self.vaporExArea = 0  # m^2  (init value...)
         self.efficacity = 0.75
+        self.prices = defaultPrices  # unit prices used by getCost (see pricing.defaultPrices)
 
-        self.QTotal = np.zeros(365)  # W ...
-        self.QWaterEx = np.zeros(365)
+        self.QTotal = np.zeros(self.getSamplesPerCycle())  # W ... (one value per sample of the pool: daily, or hourly with a weather record)
+        self.QWaterEx = np.zeros(self.getSamplesPerCycle())
         self.QVaporEx = None
         self.QPac = None
+        self.heatLoss = None  # pool arrays over numberOfYears (periodic views of the annual arrays of the shared pool)
+        self.poolTemp = None
+        self.summerMask = None
 
-        self.WPacTotal = 0
+        self.WPacTotal = 0  # Wh
+        self.vaporEnergy = 0  # MWh
+        self.peakQPac = 0  # kW
         self.geoWCost = 0
         self.pacCost = 0
         self.wellCost = 0
@@ -26,15 +34,35 @@ class Heater:
         self.vaporCost = 0
         self.totalCost = 0
 
+    @timed("Heater.getQExchanger")
     def getQExchanger(self):
+        self.checkYears()
         self.getQWaterEx()
         self.geoSystem.heater = self
 
         if not self.skipGeothermy:
             self.checkGeothermy()
+        self.completeExchanger()
+
+    def extend(self, numberOfYears):
+        # continues a computed heater over numberOfYears more years: the ground simulation is extended
+        # (GeoSystem.extendSimulation), then the exchangers, energies and costs are recomputed over the new horizon
+        self.checkYears(self.numberOfYears + numberOfYears)
+        self.numberOfYears += numberOfYears
+        self.QTotal = np.zeros(self.getSamplesPerCycle())
+        if self.skipGeothermy:
+            self.getQWaterEx()
+        else:
+            self.geoSystem.heater = self
+            self.geoSystem.extendSimulation(numberOfYears)
+            self.getGeothermyResults()
+        self.completeExchanger()
+
+    def completeExchanger(self):
         self.correctYears()
         self.QTotal += self.QWaterEx
         self.getQVaporEx()
+        self.getEnergies()
         self.getCost()
         if self.standAlone:
             self.setPlot()
@@ -51,82 +79,85 @@ class Heater:
         if self.pool.summerOff:
             self.QWaterEx[self.pool.summerDays] = 0
 
-        self.QPac = self.QWaterEx[:365]/0.75
+        self.QPac = self.QWaterEx[:self.getSamplesPerCycle()]/0.75
 
     def checkGeothermy(self):
         self.geoSystem.generateTemporalHeatMap()
+        self.getGeothermyResults()
 
+    def getGeothermyResults(self):
         self.QPac = self.geoSystem.Qpac
 
         self.QWaterEx = 0.75 * self.QPac
 
-        self.WPacTotal = np.sum(self.geoSystem.WPac) * 24
+        self.WPacTotal = np.sum(self.geoSystem.WPac) * 24 / self.pool.samplesPerDay
 
-    def correctYears(self):
-        if len(self.pool.timeVector) != self.numberOfYears * 365:
-            self.pool.timeVector = np.linspace(0, self.numberOfYears*365, self.numberOfYears*365)
-            self.pool.heatLoss = np.tile(self.pool.heatLoss, self.numberOfYears)
-            self.pool.poolTemp = np.tile(self.pool.poolTemp, self.numberOfYears)
+    def getSamplesPerCycle(self):
+        # samples of the pool arrays: one year, or the pool.numberOfYears consecutive years of its weather record
+        return 365 * self.pool.samplesPerDay * self.pool.numberOfYears
 
-            newSummerDays = []
-            for year in range(self.numberOfYears):
-                localDays = np.add(np.array(self.pool.summerDays), 365*year).tolist()
-                newSummerDays = list(itertools.chain(newSummerDays, localDays))
-            self.pool.summerDays = newSummerDays
+    def checkYears(self, numberOfYears=None):
+        # checked before the geothermy, which repeats the pool cycle over its own horizon
+        numberOfYears = self.numberOfYears if numberOfYears is None else numberOfYears
+        if numberOfYears % self.pool.numberOfYears:
+            raise ValueError("The heater horizon ({} years) must be a multiple of the years of the pool ({}).".format(numberOfYears, self.pool.numberOfYears))
 
-        self.QTotal = np.tile(self.QTotal, self.numberOfYears)
+    def correctYears(self):
+        # the pool arrays repeated over numberOfYears, without copies: the shared pool is not modified
+        self.checkYears()
+        numberOfCycles = self.numberOfYears // self.pool.numberOfYears
+        summerMask = np.zeros(self.getSamplesPerCycle(), dtype=bool)
+        summerMask[self.pool.summerDays] = True
+        self.heatLoss = PeriodicArray(self.pool.heatLoss, numberOfCycles)
+        self.poolTemp = PeriodicArray(self.pool.poolTemp, numberOfCycles)
+        self.summerMask = PeriodicArray(summerMask, numberOfCycles)
+        self.QTotal = PeriodicArray(self.QTotal, numberOfCycles)
+        if len(self.QWaterEx) == self.getSamplesPerCycle():  # without geothermy, the first cycle's load repeats
+            self.QWaterEx = PeriodicArray(self.QWaterEx, numberOfCycles)
 
     def getQVaporEx(self):
         heatCoef = 340  # W/(m^2 K)
         tempIn = 115  # Celsius
         NTU = 1.39
 
-        QDiff = np.max(self.pool.heatLoss - self.QWaterEx)
-        Cmin = QDiff / (0.75 * (tempIn - np.max(self.pool.poolTemp)))  # kJ/(K s)
+        QDiff = np.max(self.heatLoss - self.QWaterEx)
+        Cmin = QDiff / (0.75 * (tempIn - np.max(self.poolTemp)))  # kJ/(K s)
         self.vaporExArea = np.round(Cmin * NTU / heatCoef, 2)
         if self.vaporExArea < 0:
             self.vaporExArea = 0
             Cmin = 0
 
-        self.QVaporEx = 0.75 * Cmin * (tempIn - self.pool.poolTemp)
-        QOverflow = np.where(self.QVaporEx+self.QWaterEx > self.pool.heatLoss)[0]
-        self.QVaporEx[QOverflow] = self.pool.heatLoss[QOverflow] - self.QWaterEx[QOverflow]
+        self.QVaporEx = np.array(0.75 * Cmin * (tempIn - self.poolTemp))
+        QOverflow = np.where(self.QVaporEx+self.QWaterEx > self.heatLoss)[0]
+        self.QVaporEx[QOverflow] = self.heatLoss[QOverflow] - self.QWaterEx[QOverflow]
 
         if self.pool.summerOff:
-            self.QVaporEx[self.pool.summerDays] = 0
+            self.QVaporEx[self.summerMask.getIndices()] = 0
         self.QTotal += self.QVaporEx
 
     def setPlot(self):
-        self.pool.tempPlot.change_geometry(3, 1, 1)
-        self.pool.heatPlot.change_geometry(3, 1, 2)
-        heaterPlot = self.pool.fig.add_subplot(313)
+        from reporting import plotHeater
+        plotHeater(self)
 
-        heaterPlot.datas, heaterPlot.labels = [self.QWaterEx, self.QVaporEx, self.QTotal], ["Water Exchanger", "Vapor Exchanger", "Total Exchanger"]
-        for data, label in zip(heaterPlot.datas, heaterPlot.labels):
-            heaterPlot.plot(self.pool.timeVector, data/1000, label=label)
-
-        self.pool.tempPlot.legend(loc='best')
-        heaterPlot.set_xlabel("Jours")
-        heaterPlot.set_ylabel("$q$ [kW]")
-        heaterPlot.legend(loc="best")
-        heaterPlot.set_xlim(0, 364*self.numberOfYears)
+    def getEnergies(self):
+        # scalar physical outputs priced by getCost: stored results can be priced again without their arrays
+        self.vaporEnergy = sum(self.QVaporEx)*24/self.pool.samplesPerDay/1000000
+        self.peakQPac = np.max(self.QPac)/1000
 
+    @timed("Heater.getCost")
     def getCost(self):
-        waterExPrice = np.round(50*(self.waterExArea/90)**0.68, 2)
-        vaporExStockPrice = np.round(50*(self.vaporExArea/90)**0.68, 2)
-        vaporExRunPrice = np.round(4*(sum(self.QVaporEx)*24/1000000), 2)
+        costs = priceSystems(getPhysicalOutputs(self), self.prices)
 
-        self.waterCost = np.round(waterExPrice, 2)
-        self.vaporCost = np.round(vaporExStockPrice + vaporExRunPrice, 2)
-        self.geoWCost = np.round(self.WPacTotal * 5 / 1000000, 2)
-        self.pacCost = np.round(23*(np.max(self.QPac)/1000)**0.65, 2)
-        self.wellCost = np.round(self.geoSystem.numberOfWell * self.geoSystem.wellDepth * 50 / 100)
-        self.totalCost = np.round(self.waterCost + self.vaporCost + self.geoWCost + self.pacCost + self.wellCost + self.pool.insulationPrice + self.pool.nightCoverCost, 2)
+        self.waterCost = costs["waterCost"]
+        self.vaporCost = costs["vaporCost"]
+        self.geoWCost = costs["geoWCost"]
+        self.pacCost = costs["pacCost"]
+        self.wellCost = costs["wellCost"]
+        self.totalCost = costs["totalCost"]
 
         if self.standAlone:
-            print("Water Exchanger : {} m^2 => {} $".format(np.round(self.waterExArea, 1), waterExPrice))
-            print("Vapor Exchanger : {} m^2 => {} + {} = {} $".format(np.round(self.vaporExArea, 1), vaporExStockPrice, vaporExRunPrice, vaporExStockPrice+vaporExRunPrice))
+            print("Water Exchanger : {} m^2 => {} $".format(np.round(self.waterExArea, 1), costs["waterExPrice"]))
+            print("Vapor Exchanger : {} m^2 => {} + {} = {} $".format(np.round(self.vaporExArea, 1), costs["vaporExStockPrice"], costs["vaporExRunPrice"], costs["vaporExStockPrice"]+costs["vaporExRunPrice"]))
             print("ECHANGERS : {} $".format(self.waterCost+self.vaporCost))
             print("GEO POWER : {} $".format(self.geoWCost))
             print("TOTAL COST = {} $".format(self.totalCost))
-
@@ -1,7 +1,21 @@
 import numpy as np
+import collections
+import heapq
+import itertools
+import multiprocessing
+import os
+import socket
+import time
 from heater import Heater
 from geothermy import GeoSystem
-from heatLoss import Pool
+from heatLoss import Pool, PoolBatch
+from weather import loadBinary
+from geoBatch import computeHeaters
+from resultCache import ResultCache, getGeothermyKey, copyGeoState
+from search import strategies
+from pricing import CostModel, OutputStore, getPhysicalOutputs, getSensitivityTables
+from workQueue import WorkQueue, getSweepKey
+from timing import stageTimer, profileHeater
 
 
 class Optimizer:
@@ -10,15 +24,87 @@ class Optimizer:
                  exArea=(40, 60, 2),  # ......|  43 m^2
                  tmi=(273, 279, 0.5),  # .....|  275 K
                  wellNb=(30, 30.5, 3),  # ....|  30
-                 depth=(200, 201, 10)):  # ...|  200 m
+                 depth=(200, 201, 10),  # ...|  200 m
+                 batchSize=1,
+                 historyStorage="none",
+                 engine="timeStepping",
+                 workers=1,
+                 chunkSize=None,
+                 cacheFile=None,
+                 strategy="grid",
+                 streaming=False,
+                 topK=None,
+                 streamChunkSize=256,
+                 keepAllOutputs=False,
+                 memoizeGeothermy=True,
+                 geothermyCacheSize=1024,
+                 timing=False,
+                 timingFile=None,
+                 profileFile=None,
+                 progressInterval=5,
+                 queueFile=None,
+                 shard=(0, 1),
+                 sweepRange=(0, None),
+                 stopFile=None,
+                 queueWorker=True,
+                 waitForWorkers=False,
+                 leaseDuration=600,
+                 queueChunkSize=64,
+                 queuePollInterval=5,
+                 weatherFile=None,
+                 weatherYear=0,
+                 weatherYears=None):
 
         self.numberOfYears = numberOfYears
+        self.parameterRanges = {"ins": ins, "exArea": exArea, "tmi": tmi, "wellNb": wellNb, "depth": depth}
         self.numberOfDays = numberOfYears * 365
+        self.batchSize = batchSize  # number of GeoSystems advanced together in one time loop
+        self.historyStorage = historyStorage  # ground temperature history kept by each GeoSystem (see GeoSystem.allocateHistory)
+        self.engine = engine  # "timeStepping" or "superposition" (see GeoSystem.engine)
+        self.workers = workers if workers else os.cpu_count()  # worker processes used by compute (1: run in this process)
+        self.chunkSize = chunkSize  # heaters sent to a worker at once (None: about 4 chunks per worker)
+        self.resultCache = ResultCache(cacheFile) if cacheFile else None  # results of previous sweeps (SQLite file)
+        self.strategy = strategy  # "grid" (every system) or a search strategy: "coordinateDescent", "gridRefinement", "nelderMead"
+        self.search = None
+        self.streaming = streaming  # create, simulate and discard the systems chunk by chunk, keeping only their result rows
+        self.topK = topK  # keep only the topK cheapest result rows (None: all rows)
+        self.streamChunkSize = streamChunkSize  # systems alive at once in streaming mode
+        self.keepAllOutputs = keepAllOutputs  # streaming mode: keep the outputs of every system (compact column store) so reprice covers the
+                                              # whole sweep; otherwise only the outputs of the kept (topK) rows are, and reprice ranks those
+        self.resultHeap = []
+        self.resultCount = 0
+        self.memoizeGeothermy = memoizeGeothermy  # systems with the same load profile and ground share one simulation
+        self.geothermyCacheSize = geothermyCacheSize  # simulated GeoSystem states kept for later duplicates (least recently used dropped)
+        self.geothermyMemo = collections.OrderedDict()
+        self.simulatedCount = 0
+        self.deduplicatedCount = 0
+        self.timing = timing  # stage timing (see timing.StageTimer), summary printed after each compute
+        self.timingFile = timingFile  # JSON export of the stage timing
+        self.profileFile = profileFile  # the first simulated system runs under cProfile, statistics saved to this file
+        self.progressInterval = progressInterval  # seconds between two progress lines
+        self.secondsPerSystem = None  # measured throughput, used for the ETA of the next computes
+        self.lastProgress = 0
+        self.queueFile = queueFile  # on-disk work queue (SQLite file): results committed as systems finish, a restarted sweep resumes
+        self.shard = shard  # (index, count): this run only computes the systems whose sweep index % count == index
+        self.sweepRange = sweepRange  # (start, stop): this run only computes the systems of this range of sweep indices
+        self.stopFile = stopFile  # the queued sweep stops cleanly after the current chunk when this file exists
+        self.queueWorker = queueWorker  # this process computes queued systems (False: coordinator only, see sweepWorker.py)
+        self.waitForWorkers = waitForWorkers  # wait for the systems leased by other workers, taking them over if their lease expires
+        self.leaseDuration = leaseDuration  # seconds a worker has to finish a leased chunk before it can be leased again
+        self.queueChunkSize = queueChunkSize  # systems leased, computed and committed together (rounded up to batchSize x workers)
+        self.queuePollInterval = queuePollInterval  # seconds between two checks of the queue while waiting for other workers
+        stageTimer.enabled = stageTimer.enabled or timing
+        self.weatherFile = weatherFile  # weather record (.npy, see weather.saveBinary) replacing the sinusoid of Pool, memory-mapped
+        self.weatherYear = weatherYear  # first year of the record simulated ("mean": its mean year, repeated; see Pool.weatherYear)
+        self.weatherYears = weatherYears if weatherYears is not None else numberOfYears  # consecutive record years of the pool (default: the
+                                                                                         # whole horizon year by year, starting over when the record is shorter)
+        self.weather = loadBinary(weatherFile) if weatherFile is not None else None
 
         self.pools = []
         self.heaters = []
         self.geoSystems = []
         self.results = []
+        self.outputs = []  # physical outputs of every listed system (see pricing.getPhysicalOutputs), for reprice
 
         self.insulationThicknesses = np.arange(ins[0], ins[1], ins[2])
         self.exchangerAreas = np.arange(exArea[0], exArea[1], exArea[2])
@@ -26,31 +112,198 @@ class Optimizer:
         self.wellCounts = np.arange(wellNb[0], wellNb[1], wellNb[2])
         self.wellDepths = np.arange(depth[0], depth[1], depth[2])
 
-        print("Number of System = ", np.prod([len(self.insulationThicknesses), len(self.exchangerAreas), len(self.tmiBlocks), len(self.wellCounts), len(self.wellDepths)]))
+        self.numberOfSystems = int(np.prod([len(self.insulationThicknesses), len(self.exchangerAreas), len(self.tmiBlocks), len(self.wellCounts), len(self.wellDepths)]))
+        print("Number of System = ", self.numberOfSystems)
 
     def optimize(self):
+        if self.strategy != "grid":
+            self.optimizeSearch()
+            return
+        if self.queueFile is not None:
+            self.optimizeQueued()
+            return
+        if self.streaming:
+            self.optimizeStreaming()
+            return
         self.generatePools()
         self.generateGeothermy()
         self.generateHeaters()
         self.compute()
         self.listResults()
 
+    def optimizeStreaming(self):
+        self.generatePools()
+        if self.keepAllOutputs:
+            self.outputs = OutputStore(self.numberOfSystems)
+        heaters = self.iterateHeaters()
+        while True:
+            chunk = list(itertools.islice(heaters, self.streamChunkSize))
+            if not chunk:
+                break
+            self.compute(chunk)
+            for heater in chunk:
+                outputs = getPhysicalOutputs(heater)
+                self.addResult(self.getResultRow(heater), None if self.keepAllOutputs else outputs)
+                if self.keepAllOutputs:
+                    self.outputs.append(outputs)
+                heater.geoSystem.heater = None  # breaks the heater <-> geoSystem cycle, so the chunk is freed right away
+        entries = sorted(self.resultHeap, key=lambda item: (-item[0], -item[1]))
+        self.results = [row for cost, count, row, outputs in entries]
+        if not self.keepAllOutputs:
+            self.outputs = [outputs for cost, count, row, outputs in entries]
+        self.listResults()
+        print("Streamed {} systems, kept {} results".format(self.resultCount, len(self.results)))
+
+    def optimizeQueued(self):
+        self.generatePools()
+        queue = WorkQueue(self.queueFile)
+        sweep = self.getSweepKey()
+        queue.addSweep(sweep, self.iterateParameters(), self.getSweepDefinition())
+        print("Work queue {}: {}".format(sweep[:12], ", ".join("{} {}".format(count, state) for state, count in sorted(queue.getCounts(sweep).items()))))
+        self.runQueueWorker(queue, sweep, self.waitForWorkers)
+
+        # every system done so far, by this run, previous runs, other shards or other workers
+        for row, outputs in queue.getResults(sweep):
+            self.results.append(row)
+            self.outputs.append(outputs)
+        counts = queue.getCounts(sweep)
+        queue.close()
+        unfinished = counts.get("pending", 0) + counts.get("leased", 0)
+        if unfinished:
+            print("PARTIAL RESULTS: {} of {} systems done, {} not listed (run again, or with waitForWorkers=True, to complete the sweep)".format(
+                len(self.results), len(self.results) + unfinished, unfinished))
+        self.printResults()
+        print("Work queue: {} done, {} pending, {} leased".format(counts.get("done", 0), counts.get("pending", 0), counts.get("leased", 0)))
+        if unfinished:
+            print("PARTIAL RESULTS: the listing above misses {} systems".format(unfinished))
+
+    def runQueueWorker(self, queue, sweep, wait=False):
+        # computes leased chunks until no system of this run's range and shard is left to lease; with wait, then waits
+        # until the systems leased by other workers are done, leasing them again here if their lease expires
+        worker = "{}-{}".format(socket.gethostname(), os.getpid())
+        released = queue.releaseLeases(sweep, isOrphanedWorker)
+        if released:
+            print("Released {} systems leased by stopped processes of this host".format(released))
+        step = max(1, self.batchSize) * max(1, self.workers)
+        chunkSize = max(1, -(-self.queueChunkSize // step)) * step
+        total = queue.countUnfinished(sweep, self.sweepRange[0], self.sweepRange[1], self.shard)
+        done = 0
+        timeStart = self.lastProgress = time.time()
+        while not (self.stopFile is not None and os.path.exists(self.stopFile)):
+            chunk = queue.lease(sweep, worker, chunkSize, self.leaseDuration, self.sweepRange[0], self.sweepRange[1], self.shard) if self.queueWorker else []
+            if chunk:
+                heaters = [self.buildHeater(*parameters) for systemId, parameters in chunk]
+                self.compute(heaters, summary=False)
+                queue.complete(sweep, [(systemId, self.getResultRow(heater), getPhysicalOutputs(heater)) for (systemId, parameters), heater in zip(chunk, heaters)], worker)
+                for heater in heaters:
+                    heater.geoSystem.heater = None
+                done += len(chunk)
+                self.reportProgress(done, max(total, done), timeStart)
+                continue
+            unfinished = queue.countUnfinished(sweep, self.sweepRange[0], self.sweepRange[1], self.shard)
+            if not wait or unfinished == 0:
+                break
+            print("Waiting for other workers: {} systems left".format(unfinished))
+            time.sleep(self.queuePollInterval)
+        else:
+            print("Stop file found: sweep stopped")
+        if done:
+            self.printComputeSummary(timeStart)
+            if self.resultCache is not None:
+                self.resultCache.printStats()
+        if queue.expiredLeases:
+            print("Leased again {} systems whose lease had expired".format(queue.expiredLeases))
+
+    def getSweepKey(self):
+        return getSweepKey(self.numberOfYears, self.getParameterGrids(), self.getWeatherKey(), self.engine)
+
+    def getWeatherKey(self):
+        if self.weather is None:
+            return None
+        return self.weather.getKey(None) if self.weatherYear == "mean" else self.weather.getKey(self.weatherYear, self.weatherYears)
+
+    def getSweepDefinition(self):
+        # arguments a worker needs to build the same systems as this optimizer (see sweepWorker.py)
+        return dict(numberOfYears=self.numberOfYears, batchSize=self.batchSize, historyStorage=self.historyStorage, engine=self.engine,
+                    memoizeGeothermy=self.memoizeGeothermy, weatherFile=self.weatherFile, weatherYear=self.weatherYear, weatherYears=self.weatherYears, **self.parameterRanges)
+
+    def iterateParameters(self):
+        # (insulation, exchanger area, tmiBlock, wells, depth) of every system, in the order of generateGeothermy + generateHeaters
+        for exArea in self.exchangerAreas:
+            for wellDepth in self.wellDepths:
+                for wellCount in self.wellCounts:
+                    for tmiBlock in self.tmiBlocks:
+                        for thickness in self.insulationThicknesses:
+                            yield thickness, exArea, tmiBlock, wellCount, wellDepth
+
+    def iterateHeaters(self):
+        # same systems, in the same order, as generateGeothermy + generateHeaters, created only when needed
+        for parameters in self.iterateParameters():
+            yield self.buildHeater(*parameters)
+
+    def addResult(self, row, outputs=None):
+        # heap of the topK cheapest rows (max-heap on the cost), ties kept in sweep order, with the outputs of each kept row
+        entry = (-row[-1], -self.resultCount, row, outputs)
+        self.resultCount += 1
+        if self.topK is None or len(self.resultHeap) < self.topK:
+            heapq.heappush(self.resultHeap, entry)
+        elif entry > self.resultHeap[0]:
+            heapq.heapreplace(self.resultHeap, entry)
+
+    def optimizeSearch(self):
+        if self.strategy not in strategies:
+            raise ValueError("Unknown strategy '{}', expected 'grid' or one of {}.".format(self.strategy, ", ".join(strategies)))
+        self.search = strategies[self.strategy](self)
+        self.search.run()
+        self.listResults()
+        self.search.printSummary()
+
+    def getParameterGrids(self):
+        return [self.insulationThicknesses, self.exchangerAreas, self.tmiBlocks, self.wellCounts, self.wellDepths]
+
+    def getPool(self, thickness):
+        for pool in self.pools:
+            if pool.insulationThickness == thickness:
+                return pool
+        pool = Pool(insulationThickness=thickness)
+        pool.weather, pool.weatherYear, pool.weatherYears = self.weather, self.weatherYear, self.weatherYears
+        pool.getTotalLoss()
+        self.pools.append(pool)
+        return pool
+
+    def createHeater(self, thickness, exArea, tmiBlock, wellCount, wellDepth):
+        heater = self.buildHeater(thickness, exArea, tmiBlock, wellCount, wellDepth)
+        self.geoSystems.append(heater.geoSystem)
+        self.heaters.append(heater)
+        return heater
+
+    def buildHeater(self, thickness, exArea, tmiBlock, wellCount, wellDepth):
+        # one system, not kept by the optimizer
+        geoSystem = self.createGeoSystem(self.getPool(thickness), tmiBlock, wellCount, wellDepth)
+        return Heater(geoSystem, waterExArea=exArea, numberOfYears=self.numberOfYears)
+
+    def createGeoSystem(self, pool, tmiBlock, wellCount, wellDepth):
+        geoSystem = GeoSystem(pool, self.numberOfDays, 5, 100, 2)
+        geoSystem.tmiBlock = tmiBlock
+        geoSystem.numberOfWell = wellCount
+        geoSystem.wellDepth = wellDepth
+        geoSystem.historyStorage = self.historyStorage
+        geoSystem.engine = self.engine
+        return geoSystem
+
     def generatePools(self):
-        for thickness in self.insulationThicknesses:
-            pool = Pool(insulationThickness=thickness)
-            pool.getTotalLoss()
-            self.pools.append(pool)
+        # every insulation thickness in one vectorized pass
+        poolBatch = PoolBatch(insulationThickness=self.insulationThicknesses)
+        poolBatch.weather, poolBatch.weatherYear, poolBatch.weatherYears = self.weather, self.weatherYear, self.weatherYears
+        poolBatch.getTotalLoss()
+        self.pools = poolBatch.getPools()
 
     def generateGeothermy(self):
         for wellDepth in np.tile(self.wellDepths, len(self.exchangerAreas)):
             for wellCount in self.wellCounts:
                 for tmiBlock in self.tmiBlocks:
                     for pool in self.pools:
-                        geoSystem = GeoSystem(pool, self.numberOfDays, 5, 100, 2)
-                        geoSystem.tmiBlock = tmiBlock
-                        geoSystem.numberOfWell = wellCount
-                        geoSystem.wellDepth = wellDepth
-                        self.geoSystems.append(geoSystem)
+                        self.geoSystems.append(self.createGeoSystem(pool, tmiBlock, wellCount, wellDepth))
 
     def generateHeaters(self):
         nbOfSystem = len(self.geoSystems) // len(self.exchangerAreas)
@@ -60,28 +313,191 @@ class Optimizer:
                 heater = Heater(geoSystem, waterExArea=exArea, numberOfYears=self.numberOfYears)
                 self.heaters.append(heater)
 
-    def compute(self):
-        print("Estimated time: {} minutes".format(len(self.heaters) * 7/15 // 60 + (len(self.heaters) * 7/15 % 60)/60))
+    def compute(self, heaters=None, summary=True):
+        # summary: estimate, progress and summary lines of this compute (off for the chunks of a queued sweep, reported by runQueueWorker)
+        heaters = self.heaters if heaters is None else heaters
+        reportProgress = self.reportProgress if summary else lambda done, total, timeStart: None
+        if self.resultCache is not None:
+            heaters = self.resultCache.load(heaters)  # only the systems not found in the cache are simulated
+        duplicates, representatives = [], {}
+        if self.memoizeGeothermy:
+            heaters, duplicates, representatives = self.deduplicateGeothermy(heaters)
+
+        if summary and self.secondsPerSystem is not None:
+            print("Estimated time: {:.1f} minutes".format(len(heaters) * self.secondsPerSystem / 60))
 
-        import time
         timeStart = time.time()
+        if summary:
+            self.lastProgress = timeStart
+        if self.profileFile is not None and heaters and not heaters[0].skipGeothermy:
+            profileHeater(heaters[0], self.profileFile)
+            self.profileFile = None  # only one system is profiled
+            reportProgress(1, len(heaters), timeStart)
+            done = 1
+        else:
+            done = 0
 
-        for i, heater in enumerate(self.heaters):
-            print("System {}/{}".format(i+1, len(self.heaters)))
-            heater.getQExchanger()
+        if self.workers > 1 and heaters[done:]:
+            self.computeParallel(heaters[done:], done, len(heaters), timeStart, reportProgress)
+        elif self.batchSize > 1:
+            for start in range(done, len(heaters), self.batchSize):
+                computeHeaters(heaters[start:start+self.batchSize])
+                reportProgress(min(start+self.batchSize, len(heaters)), len(heaters), timeStart)
+        else:
+            for i in range(done, len(heaters)):
+                heaters[i].getQExchanger()
+                reportProgress(i+1, len(heaters), timeStart)
 
+        self.completeDuplicates(duplicates, representatives)
+        self.simulatedCount += len(heaters)
+        self.deduplicatedCount += len(duplicates)
+        if heaters:
+            self.secondsPerSystem = (time.time() - timeStart) / len(heaters)
+        if summary:
+            self.printComputeSummary(timeStart)
+
+        if self.resultCache is not None:
+            self.resultCache.store()
+            if summary:
+                self.resultCache.printStats()
+
+    def printComputeSummary(self, timeStart):
         print("Timer = ", time.time() - timeStart)
+        if self.memoizeGeothermy:
+            print("Geothermy: {} simulated, {} deduplicated".format(self.simulatedCount, self.deduplicatedCount))
+        if self.timing:
+            stageTimer.printSummary()
+            if self.timingFile is not None:
+                stageTimer.toJson(self.timingFile)
+
+    def deduplicateGeothermy(self, heaters):
+        # Different exchanger areas often give the same QPac (QWaterEx is clipped at the pool heat loss):
+        # only the first system of each (QPac, GeoSystem) key is simulated, the others reuse its ground simulation
+        unique, duplicates, representatives = [], [], {}
+        for heater in heaters:
+            if heater.skipGeothermy:
+                unique.append(heater)
+                continue
+            heater.getQWaterEx()
+            key = getGeothermyKey(heater)
+            if key in self.geothermyMemo or key in representatives:
+                duplicates.append((heater, key))
+            else:
+                representatives[key] = heater
+                unique.append(heater)
+        return unique, duplicates, representatives
+
+    def completeDuplicates(self, duplicates, representatives):
+        for key, heater in representatives.items():
+            self.geothermyMemo[key] = copyGeoState(vars(heater.geoSystem))
+        for heater, key in duplicates:
+            self.geothermyMemo.move_to_end(key)
+            vars(heater.geoSystem).update(copyGeoState(self.geothermyMemo[key]))
+            heater.geoSystem.heater = heater
+            heater.getGeothermyResults()
+            heater.completeExchanger()
+        while len(self.geothermyMemo) > self.geothermyCacheSize:
+            self.geothermyMemo.popitem(last=False)
+
+    def reportProgress(self, done, total, timeStart):
+        # progress line with an ETA from the measured throughput, at most every progressInterval seconds
+        now = time.time()
+        if now - self.lastProgress < self.progressInterval and done < total:
+            return
+        self.lastProgress = now
+        remaining = (now - timeStart) / done * (total - done)
+        print("Systems {}/{} ({:.1f} systems/s), ETA: {:.0f} min {:02.0f} s".format(done, total, done / max(now - timeStart, 1e-9), remaining // 60, remaining % 60))
+
+    def computeParallel(self, heaters, done=0, total=None, timeStart=None, reportProgress=None):
+        # Workers send back the computed state of each heater, in order (shared pools are only read).
+        chunkSize = self.chunkSize or max(1, -(-len(heaters) // (4 * self.workers)))
+        chunks = [heaters[start:start+chunkSize] for start in range(0, len(heaters), chunkSize)]
+
+        with multiprocessing.Pool(self.workers) as workerPool:
+            tasks = [(chunk, self.batchSize, stageTimer.enabled) for chunk in chunks]
+            for chunk, (states, stages) in zip(chunks, workerPool.imap(computeChunk, tasks)):
+                for heater, state in zip(chunk, states):
+                    setHeaterState(heater, state)
+                stageTimer.merge(stages)  # stage times of the workers (CPU time summed over processes)
+                done += len(chunk)
+                (reportProgress or self.reportProgress)(done, total or len(heaters), timeStart or self.lastProgress)
+
+    def getResultRow(self, heater):
+        return [heater.pool.insulationThickness, heater.waterExArea, heater.vaporExArea, np.round(heater.geoSystem.tmiBlock, 2),
+                heater.pool.insulationPrice, heater.waterCost, heater.vaporCost,
+                "{}x{}".format(heater.geoSystem.numberOfWell, heater.geoSystem.wellDepth),
+                heater.wellCost, heater.pacCost, heater.geoWCost, heater.totalCost]
 
     def listResults(self):
+        if not self.streaming:
+            for heater in self.heaters:
+                self.results.append(self.getResultRow(heater))
+                self.outputs.append(getPhysicalOutputs(heater))
+        self.printResults()
+
+    def reprice(self, prices):
+        # lists the systems again under other unit prices (see pricing.defaultPrices), without simulating them again
+        self.results = CostModel(self.outputs).getResultRows(prices)
+        if self.topK is not None:
+            self.results = sorted(self.results, key=lambda x: x[-1])[:self.topK]
+        self.printResults()
+
+    def priceSensitivity(self, name, factors):
+        # total cost of every system with the price "name" scaled by each factor (factors x systems), all in one pass
+        totals = CostModel(self.outputs).priceSensitivity(getSensitivityTables(name, factors))["totalCost"]
+        print("|{:>8}|{:>10}|{:>10}|{:>10}|{:>10}|{:>12}|{:>12}|".format("FACTOR", "INS", "WATER A", "TMI Bk", "Well NxL", "BEST $", "MEDIAN $"))
+        for factor, costs in zip(factors, totals):
+            best = self.outputs[int(np.argmin(costs))]
+            print("|{:>8}|{:>10}|{:>10}|{:>10}|{:>10}|{:>12.2f}|{:>12.2f}|".format(factor, best["insulationThickness"], best["waterExArea"], np.round(best["tmiBlock"], 2),
+                                                                         "{}x{}".format(best["numberOfWell"], best["wellDepth"]), np.min(costs), np.median(costs)))
+        return totals
+
+    def printResults(self):
         params = ["INS", "WATER A", "VAPOR A", "TMI Bk", "INS $", "XWater $", "XVapor $", "Well NxL", "WELLS $", "PAC $", "Wpac $", "TOTAL $"]
         template = "|{" + "}|{".join("{}:>{}".format(i, len(param)+2) for i, param in enumerate(params)) + "}|"
         print(template.format(*params))
 
-        for heater in self.heaters:
-            self.results.append([heater.pool.insulationThickness, heater.waterExArea, heater.vaporExArea, np.round(heater.geoSystem.tmiBlock, 2),
-                                 heater.pool.insulationPrice, heater.waterCost, heater.vaporCost,
-                                 "{}x{}".format(heater.geoSystem.numberOfWell, heater.geoSystem.wellDepth),
-                                 heater.wellCost, heater.pacCost, heater.geoWCost, heater.totalCost])
-
         for result in sorted(self.results, key=lambda x: x[-1]):
             print(template.format(*result))
+
+
+def isOrphanedWorker(worker):
+    # worker "host-pid" of this host whose process no longer exists (killed or crashed run)
+    host, separator, pid = worker.rpartition("-") if worker else ("", "", "")
+    if host != socket.gethostname() or not pid.isdigit() or os.name != "posix":  # other hosts: their leases expire
+        return False
+    try:
+        os.kill(int(pid), 0)  # signal 0: only checks that the process exists
+    except ProcessLookupError:
+        return True
+    except PermissionError:
+        return False
+    try:
+        with open("/proc/{}/stat".format(pid)) as file:
+            return file.read().rpartition(")")[2].split()[0] == "Z"  # zombie: exited, not yet reaped by its parent
+    except OSError:
+        return False
+
+
+def computeChunk(task):
+    heaters, batchSize, timing = task
+    stageTimer.enabled = timing
+    for start in range(0, len(heaters), batchSize):
+        if batchSize > 1:
+            computeHeaters(heaters[start:start+batchSize])
+        else:
+            heaters[start].getQExchanger()
+    return [getHeaterState(heater) for heater in heaters], stageTimer.pop()
+
+
+def getHeaterState(heater):
+    heaterState = {key: value for key, value in vars(heater).items() if key not in ("geoSystem", "pool")}
+    geoState = {key: value for key, value in vars(heater.geoSystem).items() if key not in ("heater", "pool")}
+    return heaterState, geoState
+
+
+def setHeaterState(heater, state):
+    heaterState, geoState = state
+    vars(heater).update(heaterState)
+    vars(heater.geoSystem).update(geoState)
+    heater.geoSystem.heater = heater
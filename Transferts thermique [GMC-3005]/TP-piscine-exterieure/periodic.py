@@ -0,0 +1,121 @@
+import numpy as np
+
+# Array made of one period repeated numberOfPeriods times (e.g. the annual pool profile over a multi-year horizon),
+# stored once. Element access, masks and reductions work on the period; arithmetic with scalars or other periodic
+# arrays gives a periodic array, and with an array varying over the horizon it works on a zero-copy
+# (periods x period) broadcast view of the period.
+
+
+class PeriodicArray:
+    __array_ufunc__ = None  # numpy operators defer to the methods below instead of copying the whole horizon
+
+    def __init__(self, period, numberOfPeriods):
+        self.period = np.asarray(period).view()
+        self.period.flags.writeable = False  # read-only view: the array it comes from (e.g. a shared Pool) is never modified through it
+        self.numberOfPeriods = numberOfPeriods
+        self.periodLength = len(self.period)
+        self.shape = (self.numberOfPeriods * self.periodLength,)
+        self.dtype = self.period.dtype
+
+    def __len__(self):
+        return self.shape[0]
+
+    def __iter__(self):
+        for i in range(self.numberOfPeriods):
+            yield from self.period
+
+    def __array__(self, dtype=None, copy=None):
+        return self.toArray() if dtype is None else self.toArray().astype(dtype)
+
+    def getView(self):
+        return np.broadcast_to(self.period, (self.numberOfPeriods, self.periodLength))
+
+    def toArray(self):
+        # copy of the whole horizon
+        return np.tile(self.period, self.numberOfPeriods)
+
+    def getIndices(self):
+        # indices of the nonzero (True) elements over the whole horizon
+        offsets = np.arange(self.numberOfPeriods)[:, np.newaxis] * self.periodLength
+        return (offsets + np.flatnonzero(self.period)).reshape(-1)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            index = np.arange(*index.indices(len(self)))
+        index = np.asarray(index)
+        if index.dtype == bool:
+            index = np.flatnonzero(index)
+        if np.any((index < -len(self)) | (index >= len(self))):
+            raise IndexError("index out of range for a periodic array of length {}".format(len(self)))
+        return self.period[index % self.periodLength]
+
+    def sum(self, axis=None, **kwargs):
+        return self.period.sum() * self.numberOfPeriods
+
+    def mean(self, axis=None, **kwargs):
+        return self.period.mean()
+
+    def max(self, axis=None, **kwargs):
+        return self.period.max()
+
+    def min(self, axis=None, **kwargs):
+        return self.period.min()
+
+    def any(self, axis=None, **kwargs):
+        return self.period.any()
+
+    def all(self, axis=None, **kwargs):
+        return self.period.all()
+
+    def apply(self, operation, other, reverse=False):
+        function = (lambda a, b: operation(b, a)) if reverse else operation
+        if isinstance(other, PeriodicArray):
+            if other.shape != self.shape or other.periodLength != self.periodLength:
+                other = other.toArray()
+            else:
+                return PeriodicArray(function(self.period, other.period), self.numberOfPeriods)
+        if np.ndim(other) == 0 or len(other) == self.periodLength:  # scalar or one period
+            return PeriodicArray(function(self.period, other), self.numberOfPeriods)
+        other = np.asarray(other)
+        if other.shape != self.shape:
+            raise ValueError("operands could not be broadcast together with shapes {} {}".format(self.shape, other.shape))
+        return function(self.getView(), other.reshape(self.numberOfPeriods, self.periodLength)).reshape(-1)
+
+    def __add__(self, other):
+        return self.apply(np.add, other)
+
+    def __radd__(self, other):
+        return self.apply(np.add, other, True)
+
+    def __sub__(self, other):
+        return self.apply(np.subtract, other)
+
+    def __rsub__(self, other):
+        return self.apply(np.subtract, other, True)
+
+    def __mul__(self, other):
+        return self.apply(np.multiply, other)
+
+    def __rmul__(self, other):
+        return self.apply(np.multiply, other, True)
+
+    def __truediv__(self, other):
+        return self.apply(np.true_divide, other)
+
+    def __rtruediv__(self, other):
+        return self.apply(np.true_divide, other, True)
+
+    def __neg__(self):
+        return PeriodicArray(-self.period, self.numberOfPeriods)
+
+    def __gt__(self, other):
+        return self.apply(np.greater, other)
+
+    def __ge__(self, other):
+        return self.apply(np.greater_equal, other)
+
+    def __lt__(self, other):
+        return self.apply(np.less, other)
+
+    def __le__(self, other):
+        return self.apply(np.less_equal, other)
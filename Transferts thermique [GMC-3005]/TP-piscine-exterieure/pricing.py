@@ -0,0 +1,116 @@
+import numpy as np
+
+# Cost model of the heating system, kept apart from the physics: a simulation gives physical outputs (areas,
+# energies, peak power, well length), priceSystems turns them into costs. Heater.getCost prices one system,
+# CostModel prices the stored outputs of a whole sweep in one NumPy pass, so new prices need no new simulation.
+
+defaultPrices = {
+    "exchanger": 50,  # $ for an exchanger of exchangerArea, scaled by (area/exchangerArea)^exchangerExponent
+    "exchangerArea": 90,  # m^2
+    "exchangerExponent": 0.68,
+    "electricity": 5,  # $/MWh (heat pump)
+    "steam": 4,  # $/MWh (vapor exchanger)
+    "well": 50,  # $/100 m
+    "pac": 23,  # $, scaled by (peak power in kW)^pacExponent
+    "pacExponent": 0.65,
+    "insulation": 100,  # $/m^3
+    "nightCover": 50,  # $
+}
+
+# outputs priced by priceSystems, and the parameters needed to list a system
+outputColumns = ["waterExArea", "vaporExArea", "vaporEnergy", "WPacTotal", "peakQPac", "wellLength", "insulationVolume", "nightCover"]
+parameterColumns = ["insulationThickness", "tmiBlock", "numberOfWell", "wellDepth"]
+
+
+def getPhysicalOutputs(heater):
+    geo, pool = heater.geoSystem, heater.pool
+    return {"waterExArea": heater.waterExArea, "vaporExArea": heater.vaporExArea,
+            "vaporEnergy": heater.vaporEnergy,  # MWh
+            "WPacTotal": heater.WPacTotal,  # Wh
+            "peakQPac": heater.peakQPac,  # kW
+            "wellLength": geo.numberOfWell * geo.wellDepth,  # m
+            "insulationVolume": pool.sideArea * pool.insulationThickness,  # m^3
+            "nightCover": pool.nightCover,
+            "insulationThickness": pool.insulationThickness, "tmiBlock": geo.tmiBlock, "numberOfWell": geo.numberOfWell, "wellDepth": geo.wellDepth}
+
+
+def priceSystems(outputs, prices=defaultPrices):
+    # outputs and prices may be scalars or arrays (broadcast together): one system, a sweep, or sweeps x price tables
+    costs = {}
+    costs["waterExPrice"] = np.round(prices["exchanger"]*(outputs["waterExArea"]/prices["exchangerArea"])**prices["exchangerExponent"], 2)
+    costs["vaporExStockPrice"] = np.round(prices["exchanger"]*(outputs["vaporExArea"]/prices["exchangerArea"])**prices["exchangerExponent"], 2)
+    costs["vaporExRunPrice"] = np.round(prices["steam"]*outputs["vaporEnergy"], 2)
+
+    costs["waterCost"] = np.round(costs["waterExPrice"], 2)
+    costs["vaporCost"] = np.round(costs["vaporExStockPrice"] + costs["vaporExRunPrice"], 2)
+    costs["geoWCost"] = np.round(outputs["WPacTotal"] * prices["electricity"] / 1000000, 2)
+    costs["pacCost"] = np.round(prices["pac"]*outputs["peakQPac"]**prices["pacExponent"], 2)
+    costs["wellCost"] = np.round(outputs["wellLength"] * prices["well"] / 100)
+    costs["insulationPrice"] = np.round(outputs["insulationVolume"]*prices["insulation"], 2)
+    costs["nightCoverCost"] = outputs["nightCover"]*prices["nightCover"]
+    costs["totalCost"] = np.round(costs["waterCost"] + costs["vaporCost"] + costs["geoWCost"] + costs["pacCost"] + costs["wellCost"] + costs["insulationPrice"] + costs["nightCoverCost"], 2)
+    return costs
+
+
+def getSensitivityTables(name, factors, prices=defaultPrices):
+    # price tables where one price is scaled by each factor, the others unchanged
+    return [dict(prices, **{name: prices[name] * factor}) for factor in factors]
+
+
+class OutputStore:
+    # getPhysicalOutputs of up to size systems, as one preallocated array per column (a few bytes per system instead of
+    # a dict); indexing or iterating gives the outputs of a system back as a dict
+    def __init__(self, size):
+        self.size = size
+        self.count = 0
+        self.columns = None  # allocated at the first system, with the dtype of each of its values
+
+    def append(self, outputs):
+        if self.columns is None:
+            self.columns = {name: np.empty(self.size, dtype=np.asarray(outputs[name]).dtype) for name in outputColumns + parameterColumns}
+        for name, column in self.columns.items():
+            column[self.count] = outputs[name]
+        self.count += 1
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, i):
+        if not -self.count <= i < self.count:
+            raise IndexError("system {} not in the store ({} systems)".format(i, self.count))
+        return {name: column[i % self.count] for name, column in self.columns.items()}
+
+    def __iter__(self):
+        for i in range(self.count):
+            yield self[i]
+
+
+class CostModel:
+    def __init__(self, outputs):
+        if isinstance(outputs, OutputStore):
+            self.outputs = outputs
+            self.columns = {name: outputs.columns[name][:len(outputs)].astype(float) if len(outputs) else np.zeros(0) for name in outputColumns}
+        else:
+            self.outputs = list(outputs)  # getPhysicalOutputs of each system
+            self.columns = {name: np.array([output[name] for output in self.outputs], dtype=float) for name in outputColumns}
+
+    def price(self, prices=defaultPrices):
+        # costs of every system (arrays of len(outputs))
+        return priceSystems(self.columns, prices)
+
+    def priceSensitivity(self, priceTables):
+        # costs of every system under every price table (arrays of len(priceTables) x len(outputs)), in one pass:
+        # each price becomes a column broadcast against the systems
+        prices = {name: np.array([table.get(name, defaultPrices[name]) for table in priceTables], dtype=float)[:, None] for name in defaultPrices}
+        return priceSystems(self.columns, prices)
+
+    def getResultRows(self, prices=defaultPrices):
+        # same rows as Optimizer.getResultRow
+        costs = self.price(prices)
+        rows = []
+        for i, output in enumerate(self.outputs):
+            rows.append([output["insulationThickness"], output["waterExArea"], output["vaporExArea"], np.round(output["tmiBlock"], 2),
+                         costs["insulationPrice"][i], costs["waterCost"][i], costs["vaporCost"][i],
+                         "{}x{}".format(output["numberOfWell"], output["wellDepth"]),
+                         costs["wellCost"][i], costs["pacCost"][i], costs["geoWCost"][i], costs["totalCost"][i]])
+        return rows
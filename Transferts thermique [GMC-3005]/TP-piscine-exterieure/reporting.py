@@ -0,0 +1,112 @@
+import numpy as np
+import matplotlib.pyplot as plt
+
+# Plots of the pool, heater and geothermy results. Kept out of the model modules, which import this module only
+# when a plot is asked for (Pool.setPlot, Heater.setPlot, GeoSystem.graph*): the physics imports without matplotlib.
+
+
+def plotPool(pool):
+    pool.fig, [pool.tempPlot, pool.heatPlot] = plt.subplots(2)
+    pool.tempPlot.datas, pool.tempPlot.labels = [pool.airTemp, pool.poolTemp], ["Air", "Piscine"]
+    pool.heatPlot.datas, pool.heatPlot.labels = [pool.heatLoss, pool.QEvap, pool.QWaterInput, pool.QTop, pool.QWalls, pool.QRadiation], ["Total", "Évaporation", "Remplissage", "Surface", "Murs", "Rayonnement"]
+
+    for i, graph in enumerate([pool.tempPlot, pool.heatPlot]):
+        for data, label in zip(graph.datas, graph.labels):
+            if i == 0:
+                graph.set_title("Températures au cours de l'année")
+                graph.plot(pool.timeVector, data, label=label)
+                graph.set_ylabel("T [$\degree$C]")
+            else:
+                graph.set_title("Bilan des pertes thermiques annuelles")
+                graph.plot(pool.timeVector, data/1000, label="{} ({}%)".format(label, np.round(100*np.sum(data)/np.sum(pool.heatLoss), 1)))
+                graph.set_ylabel("$q$ [kW]")
+
+        graph.set_xlabel("Jours")
+        graph.legend(loc="best")
+        graph.set_xlim(0, 365)
+
+
+def showPlot():
+    plt.tight_layout()
+    plt.show()
+
+
+def plotHeater(heater):
+    heater.pool.tempPlot.change_geometry(3, 1, 1)
+    heater.pool.heatPlot.change_geometry(3, 1, 2)
+    heaterPlot = heater.pool.fig.add_subplot(313)
+
+    timeVector = np.linspace(0, heater.numberOfYears*365, len(heater.QTotal))
+    heaterPlot.datas, heaterPlot.labels = [heater.QWaterEx, heater.QVaporEx, heater.QTotal], ["Water Exchanger", "Vapor Exchanger", "Total Exchanger"]
+    for data, label in zip(heaterPlot.datas, heaterPlot.labels):
+        heaterPlot.plot(timeVector, np.asarray(data)/1000, label=label)
+
+    heater.pool.tempPlot.legend(loc='best')
+    heaterPlot.set_xlabel("Jours")
+    heaterPlot.set_ylabel("$q$ [kW]")
+    heaterPlot.legend(loc="best")
+    heaterPlot.set_xlim(0, 364*heater.numberOfYears)
+
+
+def graphOneNodeAtAllTime(geoSystem, x):
+    times, nodeTemp = geoSystem.getNodeHistory(x)
+    plt.plot(times, nodeTemp)
+    plt.title("Temperature of node #{} for all {} days.".format(x, geoSystem.numberOfDays))
+    plt.xlabel("[Days]")
+    plt.ylabel("Temperature [°K]")
+    plt.show()
+
+
+def graphTmoTmiAtAllTime(geoSystem):
+    plt.plot(range(len(geoSystem.TmoList)), geoSystem.TmoList, 'k', label="Tmo")
+    plt.plot(range(len(geoSystem.TmiList)), geoSystem.TmiList, 'r', label="Tmi")
+    plt.title("Temperature of Calorific Liquid for all days")
+    plt.legend()
+    plt.xlabel("[Days]")
+    plt.ylabel("Temperature [°K]")
+    plt.show()
+
+
+def graphQSystems(geoSystem):
+    plt.plot(range(len(geoSystem.Qpac)), geoSystem.heater.QVaporEx/1000, 'k', label="QVapor")
+    plt.plot(range(len(geoSystem.Qpac)), geoSystem.heater.QWaterEx/1000, 'r', label="QWater")
+    # plt.plot(range(len(geoSystem.Qpac)), geoSystem.heater.QPac/1000 - geoSystem.Qpac/1000, 'b', label="QVapor")
+    plt.legend(loc=1)
+    plt.title('Q of systems')
+    plt.xlabel("[Days]")
+    plt.ylabel("Heat [kW]")
+    plt.show()
+
+
+def graphSuperpositionProfiles(geoSystem):
+    nodeDistance = geoSystem.nodeRadius[geoSystem.historyNodeIndices] - geoSystem.ductRadius if geoSystem.radialGrid == "stretched" else geoSystem.historyNodeIndices
+    for i in np.where(geoSystem.historyTimes < geoSystem.numberOfTimeStep-10)[0]:
+        plt.plot(nodeDistance, geoSystem.motherMatrix[:, i])
+    plt.title("Profile Evolution")
+    plt.xlabel("[Meters]")
+    plt.ylabel("Temperature [°K]")
+    plt.show()
+
+
+def graphWPACAllTime(geoSystem):
+    fig, ax1 = plt.subplots()
+    ax1.set_xlabel("Days")
+    ax1.plot(range(len(geoSystem.WPac)), geoSystem.WPac/1000, 'b', label="WPac")
+    ax2 = ax1.twinx()
+    ax2.plot(range(len(geoSystem.copList)), geoSystem.copList, 'r', label="COP")
+    ax1.legend(loc=1)
+    ax2.legend(loc=2)
+    plt.title("PAC Informations")
+    ax2.set_ylabel("COP")
+    ax1.set_ylabel("Wpac [kW]")
+    plt.show()
+
+
+def graphSuperpositionNodes(geoSystem):
+    keptTimes = geoSystem.historyTimes < geoSystem.numberOfTimeStep - 10
+    for i in range(len(geoSystem.historyNodeIndices)):
+        plt.plot(geoSystem.historyTimes[keptTimes], geoSystem.motherMatrix[i, keptTimes])
+    plt.title("Nodes Temperature Variation")
+    plt.xlabel("[Days]")
+    plt.ylabel("Temperature [°K]")
+    plt.show()
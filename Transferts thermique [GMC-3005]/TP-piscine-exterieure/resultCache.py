@@ -0,0 +1,93 @@
+import numpy as np
+import copy
+import hashlib
+import json
+import os
+import sqlite3
+
+# Sources of the model: any change to one of them invalidates the stored results
+modelFiles = ["heatLoss.py", "heater.py", "geothermy.py", "geoBatch.py", "solver.py", "superposition.py", "weather.py", "periodic.py"]
+
+
+def getModelVersion():
+    digest = hashlib.sha256()
+    for fileName in modelFiles:
+        with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), fileName), "rb") as file:
+            digest.update(file.read())
+    return digest.hexdigest()
+
+
+def getScalars(obj):
+    # scalar attributes of an object (the parameters, plus results still at their initial value before computing)
+    scalars = {}
+    for key, value in vars(obj).items():
+        if isinstance(value, np.generic):
+            value = value.item()
+        if value is None or isinstance(value, (bool, int, float, str)):
+            scalars[key] = value
+    return scalars
+
+
+def getSystemKey(heater):
+    geoParameters = getScalars(heater.geoSystem)
+    geoParameters["calorificLiquid"] = heater.geoSystem.calorificLiquid
+    parameters = {"pool": getScalars(heater.pool), "geoSystem": geoParameters, "heater": getScalars(heater)}
+    return hashlib.sha256(json.dumps(parameters, sort_keys=True).encode()).hexdigest()
+
+
+def getGeothermyKey(heater):
+    # the ground simulation only depends on the GeoSystem parameters and on the heat pump load profile
+    geoParameters = getScalars(heater.geoSystem)
+    geoParameters["calorificLiquid"] = heater.geoSystem.calorificLiquid
+    digest = hashlib.sha256(json.dumps(geoParameters, sort_keys=True).encode())
+    digest.update(np.asarray(heater.QPac, dtype=float).tobytes())
+    return digest.hexdigest()
+
+
+def copyGeoState(state):
+    # copy of the simulated state (vars) of a GeoSystem: lists and arrays are copied, the shared operator is not
+    return {key: copy.deepcopy(value) if isinstance(value, (list, np.ndarray)) else value for key, value in state.items() if key not in ("heater", "pool")}
+
+
+class ResultCache:
+    def __init__(self, path):
+        self.path = path
+        self.version = getModelVersion()
+        self.hits = 0
+        self.misses = 0
+        self.stored = 0
+        self.pending = []  # (heater, key) of the misses of the last load, saved by store
+
+        self.connection = sqlite3.connect(path)
+        self.connection.execute("CREATE TABLE IF NOT EXISTS results (key TEXT PRIMARY KEY, version TEXT, result TEXT)")
+        self.invalidated = self.connection.execute("DELETE FROM results WHERE version != ?", (self.version,)).rowcount
+        self.connection.commit()
+
+    def load(self, heaters):
+        # Results already stored are loaded into their heater, the heaters left to compute are returned
+        self.pending = []
+        for heater in heaters:
+            key = getSystemKey(heater)
+            row = self.connection.execute("SELECT result FROM results WHERE key = ? AND version = ?", (key, self.version)).fetchone()
+            if row is None:
+                self.misses += 1
+                self.pending.append((heater, key))
+            else:
+                self.hits += 1
+                vars(heater).update(json.loads(row[0]))
+                heater.getCost()  # priced again from the stored physical outputs, with the current prices
+        return [heater for heater, key in self.pending]
+
+    def store(self):
+        rows = [(key, self.version, json.dumps(getScalars(heater))) for heater, key in self.pending]
+        self.connection.executemany("INSERT OR REPLACE INTO results (key, version, result) VALUES (?, ?, ?)", rows)
+        self.connection.commit()
+        self.stored += len(rows)
+        self.pending = []
+
+    def printStats(self):
+        total = self.hits + self.misses
+        print("Result cache: {} hits, {} misses ({:.0f}% hits), {} stored, {} invalidated".format(self.hits, self.misses, 100 * self.hits / max(total, 1), self.stored, self.invalidated))
+
+    def close(self):
+        self.connection.close()
@@ -0,0 +1,147 @@
+import numpy as np
+import itertools
+
+# Search strategies for Optimizer: instead of simulating the full grid, points are evaluated on demand and the
+# search moves towards the lowest totalCost. A point is (insulation, water exchanger area, tmiBlock, wells, depth).
+
+
+class SearchStrategy:
+    name = None
+
+    def __init__(self, optimizer):
+        self.optimizer = optimizer
+        self.grids = optimizer.getParameterGrids()
+        self.costs = {}  # point -> totalCost of every simulated point
+        self.evaluations = 0
+
+    def evaluate(self, points):
+        # simulates the points not evaluated yet (all at once, so batching, workers and the result cache apply)
+        points = [self.snap(point) for point in points]
+        newPoints = list(dict.fromkeys(point for point in points if point not in self.costs))
+        heaters = [self.optimizer.createHeater(*point) for point in newPoints]
+        if heaters:
+            self.optimizer.compute(heaters)
+        for point, heater in zip(newPoints, heaters):
+            self.costs[point] = heater.totalCost
+        self.evaluations += len(newPoints)
+        return [self.costs[point] for point in points]
+
+    def snap(self, point):
+        return tuple(float(np.round(value, 6)) for value in point)
+
+    def getBest(self):
+        return min(self.costs, key=self.costs.get)
+
+    def getPoint(self, indices):
+        return tuple(grid[index] for grid, index in zip(self.grids, indices))
+
+    def printSummary(self):
+        gridSize = np.prod([len(grid) for grid in self.grids])
+        best = self.getBest()
+        print("{}: {} simulations ({:.1f}% of the {} grid systems)".format(self.name, self.evaluations, 100 * self.evaluations / gridSize, gridSize))
+        print("Best: INS {} m, WATER A {} m^2, TMI Bk {} K, {}x{} wells => {} $".format(*best, self.costs[best]))
+
+
+class CoordinateDescent(SearchStrategy):
+    # moves one parameter at a time to the best neighbouring grid value, until no neighbour improves the cost
+    name = "Coordinate descent"
+
+    def run(self):
+        indices = [len(grid) // 2 for grid in self.grids]
+        bestCost = self.evaluate([self.getPoint(indices)])[0]
+        improved = True
+        while improved:
+            improved = False
+            for dimension, grid in enumerate(self.grids):
+                while True:
+                    neighbours = [indices[:dimension] + [index] + indices[dimension+1:] for index in (indices[dimension] - 1, indices[dimension] + 1) if 0 <= index < len(grid)]
+                    costs = self.evaluate([self.getPoint(neighbour) for neighbour in neighbours])
+                    if not neighbours or min(costs) >= bestCost:
+                        break
+                    indices, bestCost = neighbours[int(np.argmin(costs))], min(costs)
+                    improved = True
+
+
+class GridRefinement(SearchStrategy):
+    # coarse grid over the whole range, then finer grids around the current best until the original step is reached
+    name = "Grid refinement"
+
+    def __init__(self, optimizer, pointsPerDimension=3):
+        SearchStrategy.__init__(self, optimizer)
+        self.pointsPerDimension = pointsPerDimension
+
+    def run(self):
+        spacing = [max(1, (len(grid) - 1) // (self.pointsPerDimension - 1)) for grid in self.grids]
+        lows, highs = [0 for grid in self.grids], [len(grid) - 1 for grid in self.grids]
+        while True:
+            axes = [sorted(set(list(range(low, high + 1, step)) + [high])) for low, high, step in zip(lows, highs, spacing)]
+            self.evaluate([self.getPoint(indices) for indices in itertools.product(*axes)])
+            best = self.getBest()
+            center = [int(np.argmin(np.abs(grid - value))) for grid, value in zip(self.grids, best)]
+            if max(spacing) == 1:
+                break
+            spacing = [max(1, step // 2) for step in spacing]  # next grid: the best point and its neighbours at half the spacing
+            lows = [max(0, index - step) for index, step in zip(center, spacing)]
+            highs = [min(len(grid) - 1, index + step) for grid, index, step in zip(self.grids, center, spacing)]
+
+
+class NelderMead(SearchStrategy):
+    # simplex search on the continuous parameters (insulation, exchanger area, tmiBlock) scaled to [0, 1];
+    # the well count and depth are snapped to their grid values
+    name = "Nelder-Mead"
+
+    def __init__(self, optimizer, maxEvaluations=60, tolerance=1e-3):
+        SearchStrategy.__init__(self, optimizer)
+        self.maxEvaluations = maxEvaluations
+        self.tolerance = tolerance  # stops when the simplex is smaller than this (scaled units)
+        self.lows = np.array([grid[0] for grid in self.grids])
+        self.highs = np.array([grid[-1] for grid in self.grids])
+        self.dimensions = [dimension for dimension, grid in enumerate(self.grids) if len(grid) > 1]
+
+    def snap(self, point):
+        point = np.clip(point, self.lows, self.highs)
+        for dimension in (3, 4):  # wells and depth
+            point[dimension] = self.grids[dimension][np.argmin(np.abs(self.grids[dimension] - point[dimension]))]
+        return SearchStrategy.snap(self, point)
+
+    def toPoint(self, x):
+        point = (self.lows + self.highs) / 2
+        point[self.dimensions] = self.lows[self.dimensions] + x * (self.highs - self.lows)[self.dimensions]
+        return point
+
+    def run(self):
+        numberOfDimensions = len(self.dimensions)
+        if numberOfDimensions == 0:
+            self.evaluate([self.toPoint(np.zeros(0))])
+            return
+        simplex = [np.full(numberOfDimensions, 0.5)] + [np.full(numberOfDimensions, 0.5) + 0.4 * np.eye(numberOfDimensions)[i] for i in range(numberOfDimensions)]
+        costs = self.evaluate([self.toPoint(x) for x in simplex])
+
+        for iteration in range(10 * self.maxEvaluations):  # cached points cost nothing: iterations are bounded as well
+            if self.evaluations >= self.maxEvaluations:
+                break
+            order = np.argsort(costs)
+            simplex, costs = [simplex[i] for i in order], [costs[i] for i in order]
+            if max(np.max(np.abs(x - simplex[0])) for x in simplex[1:]) < self.tolerance:
+                break
+            centroid = np.mean(simplex[:-1], axis=0)
+            reflected = np.clip(centroid + (centroid - simplex[-1]), 0, 1)
+            reflectedCost = self.evaluate([self.toPoint(reflected)])[0]
+
+            if reflectedCost < costs[0]:
+                expanded = np.clip(centroid + 2 * (centroid - simplex[-1]), 0, 1)
+                expandedCost = self.evaluate([self.toPoint(expanded)])[0]
+                simplex[-1], costs[-1] = (expanded, expandedCost) if expandedCost < reflectedCost else (reflected, reflectedCost)
+            elif reflectedCost < costs[-2]:
+                simplex[-1], costs[-1] = reflected, reflectedCost
+            else:
+                contracted = centroid + 0.5 * (simplex[-1] - centroid)
+                contractedCost = self.evaluate([self.toPoint(contracted)])[0]
+                if contractedCost < costs[-1]:
+                    simplex[-1], costs[-1] = contracted, contractedCost
+                else:  # shrink towards the best vertex
+                    simplex = [simplex[0]] + [simplex[0] + 0.5 * (x - simplex[0]) for x in simplex[1:]]
+                    costs = [costs[0]] + self.evaluate([self.toPoint(x) for x in simplex[1:]])
+
+
+strategies = {"coordinateDescent": CoordinateDescent, "gridRefinement": GridRefinement, "nelderMead": NelderMead}
@@ -0,0 +1,94 @@
+# TP - Transferts thermiques (GMC-3005)
+# Solveur tridiagonal (algorithme de Thomas) pour le système d'équations de conduction radiale.
+# La matrice est factorisée une seule fois, chaque résolution coûte ensuite O(n).
+
+import numpy as np
+
+
+class TridiagonalSolver:
+    def __init__(self, lower, diagonal, upper):
+        # lower[i] = A[i+1, i], diagonal[i] = A[i, i], upper[i] = A[i, i+1]
+        self.lower = np.array(lower, dtype=float)
+        self.diagonal = np.array(diagonal, dtype=float)
+        self.upper = np.array(upper, dtype=float)
+        self.numberOfNodes = len(self.diagonal)
+
+        self.multipliers = None
+        self.pivots = None
+
+        self.factorize()
+
+    @classmethod
+    def fromMatrix(cls, matrix):
+        return cls(np.diag(matrix, -1), np.diag(matrix), np.diag(matrix, 1))
+
+    def toDense(self):
+        return np.diag(self.diagonal) + np.diag(self.lower, -1) + np.diag(self.upper, 1)
+
+    def factorize(self):
+        # Élimination de Gauss sans pivotage (la matrice de conduction est à diagonale dominante)
+        multipliers = [0.0 for i in range(self.numberOfNodes)]
+        pivots = [float(self.diagonal[0])] + [0.0 for i in range(self.numberOfNodes - 1)]
+
+        for i in range(1, self.numberOfNodes):
+            multipliers[i] = float(self.lower[i - 1]) / pivots[i - 1]
+            pivots[i] = float(self.diagonal[i]) - multipliers[i] * float(self.upper[i - 1])
+
+        self.multipliers = multipliers
+        self.pivots = pivots
+        self.upperList = self.upper.tolist()
+
+    def solve(self, rhs):
+        rhs = np.asarray(rhs, dtype=float)
+        if rhs.size == self.numberOfNodes:
+            solution = self.solveSingle(rhs.ravel().tolist())
+        else:
+            solution = self.solveMultiple(rhs.reshape(self.numberOfNodes, -1))
+        return np.reshape(solution, rhs.shape)
+
+    def solveSingle(self, rhs):
+        # Une seule colonne: boucle sur des flottants Python (plus rapide que numpy pour n ~ 50)
+        n = self.numberOfNodes
+        for i in range(1, n):
+            rhs[i] -= self.multipliers[i] * rhs[i - 1]
+
+        rhs[n - 1] /= self.pivots[n - 1]
+        for i in range(n - 2, -1, -1):
+            rhs[i] = (rhs[i] - self.upperList[i] * rhs[i + 1]) / self.pivots[i]
+        return np.array(rhs)
+
+    def solveMultiple(self, rhs):
+        # Plusieurs colonnes (plusieurs systèmes) résolues en même temps, mêmes opérations que solveSingle
+        n = self.numberOfNodes
+        solution = np.array(rhs, dtype=float)
+        for i in range(1, n):
+            solution[i] -= self.multipliers[i] * solution[i - 1]
+
+        solution[n - 1] /= self.pivots[n - 1]
+        for i in range(n - 2, -1, -1):
+            solution[i] = (solution[i] - self.upperList[i] * solution[i + 1]) / self.pivots[i]
+        return solution
+
+
+class OperatorCache:
+    # Opérateurs (diagonales + factorisation) partagés entre tous les GeoSystem ayant la même grille
+    def __init__(self):
+        self.operators = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, builder):
+        if key in self.operators:
+            self.hits += 1
+        else:
+            self.misses += 1
+            self.operators[key] = builder()
+        return self.operators[key]
+
+    def clear(self):
+        self.operators = {}
+        self.hits = 0
+        self.misses = 0
+
+
+operatorCache = OperatorCache()
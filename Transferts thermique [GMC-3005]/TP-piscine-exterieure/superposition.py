@@ -0,0 +1,157 @@
+# TP - Transferts thermiques (GMC-3005)
+# Moteur par superposition pour GeoSystem.
+# Sans le bloquage à tmiBlock, le système sol + liquide est linéaire à coefficients constants: Tmi, Tmo et la
+# température des noeuds sont la convolution de l'historique de Qpac avec une réponse impulsionnelle unique.
+# Cette réponse est calculée une seule fois par configuration (grille, sol, puits, débit) et gardée en cache,
+# chaque scénario se résume ensuite à des convolutions par FFT; seul le bloquage à tmiBlock est résolu pas par pas.
+
+import collections
+import numpy as np
+from timing import timed
+
+
+class GroundResponse:
+    def __init__(self, baseline, impulse, nodeIndices):
+        self.baselineTmi, self.baselineTmo, self.baselineNodes = baseline  # évolution sans charge (dérive due aux coefficients arrondis)
+        self.Tmi, self.Tmo, self.nodes = impulse  # réponse à une impulsion de 1 W de Qpac au premier pas (noeuds x temps pour le sol)
+        self.nodeIndices = nodeIndices  # noeuds conservés (lignes de nodes): le premier noeud, plus ceux de l'historique
+        self.spectra = {}
+
+    def getSpectra(self, fftLength):
+        if fftLength not in self.spectra:
+            self.spectra[fftLength] = [np.fft.rfft(response, fftLength, axis=-1) for response in (self.Tmi, self.Tmo, self.nodes)]
+        return self.spectra[fftLength]
+
+
+class ResponseCache:
+    def __init__(self, maxSize=16):
+        self.maxSize = maxSize  # réponses gardées (la moins récemment utilisée est retirée)
+        self.responses = collections.OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, builder):
+        if key in self.responses:
+            self.hits += 1
+            self.responses.move_to_end(key)
+        else:
+            self.misses += 1
+            self.responses[key] = builder()
+            while len(self.responses) > self.maxSize:
+                self.responses.popitem(last=False)
+        return self.responses[key]
+
+    def clear(self):
+        self.responses = collections.OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+
+responseCache = ResponseCache()
+
+
+class SuperpositionEngine:
+    def __init__(self, geoSystem):
+        self.geoSystem = geoSystem
+        self.blockLength = geoSystem.superpositionBlockLength  # pas de temps traités entre deux convolutions de l'historique
+
+        geo = geoSystem
+        self.mdotCp = geo.mdotTotal * geo.calorificLiquid['Cp'][geo.chosenCalorificLiquid]
+        self.numberOfSegments = int(2*geo.wellDepth / geo.wellDistanceStep)
+        self.decayFactor = geo.getTmoDecayFactor(geo.wellDistanceStep)
+        historyNodes = geo.historyNodeIndices if geo.motherMatrix is not None else []
+        self.nodeIndices = np.union1d([0], historyNodes).astype(int)  # sans historique, seul le premier noeud est gardé
+
+    def getResponseKey(self):
+        geo = self.geoSystem
+        return geo.getOperatorKey() + (geo.numberOfTimeStep, self.mdotCp, geo.totalLineicResistance, self.decayFactor, self.numberOfSegments, tuple(self.nodeIndices))
+
+    @timed("SuperpositionEngine.computeResponse")
+    def computeResponse(self):
+        return GroundResponse(self.simulateLinear(283, 0), self.simulateLinear(0, 1), self.nodeIndices)
+
+    def simulateLinear(self, initialTemp, impulse):
+        # Même schéma que GeoSystem.advanceTimeSteps, sans arrondi ni bloquage, pour Qpac = impulse au premier pas seulement
+        geo = self.geoSystem
+        numberOfSteps = geo.numberOfTimeStep - 1
+        profileFactors = self.decayFactor ** np.arange(1, self.numberOfSegments + 1)
+        outletFactor, meanFactor = profileFactors[-1], np.mean(profileFactors)
+        storageFactor = geo.groundrhocp / geo.timeStepSecond
+        boundaryFactor = geo.getBoundaryFactor()
+
+        Tmi, Tmo, nodes = np.zeros(numberOfSteps), np.zeros(numberOfSteps), np.zeros((len(self.nodeIndices), numberOfSteps))
+        groundTemp = np.full(geo.numberOfNodes, float(initialTemp))
+        TmoPrevious = initialTemp
+        for times in range(numberOfSteps):
+            Tsol = groundTemp[0]
+            Tmi[times] = TmoPrevious - (impulse if times == 0 else 0) / self.mdotCp
+            gap = Tsol - Tmi[times]
+            Tmo[times] = TmoPrevious = Tsol - gap * outletFactor
+            TmoMean = Tsol - gap * meanFactor
+
+            liveTemp = storageFactor * groundTemp
+            liveTemp[0] += ((TmoMean - Tsol)/geo.totalLineicResistance) / boundaryFactor
+            liveTemp[-1] = initialTemp
+            groundTemp = geo.tridiagonalSolver.solve(liveTemp)
+            nodes[:, times] = groundTemp[self.nodeIndices]
+        return Tmi, Tmo, nodes
+
+    @timed("SuperpositionEngine.generateTemporalHeatMap")
+    def generateTemporalHeatMap(self):
+        geo = self.geoSystem
+        numberOfSteps = geo.numberOfTimeStep - 1
+        response = responseCache.get(self.getResponseKey(), self.computeResponse)
+        fftLength = 2 ** int(np.ceil(np.log2(2 * numberOfSteps)))
+        TmiSpectrum, TmoSpectrum, nodesSpectrum = response.getSpectra(fftLength)
+
+        Qpac = np.array(geo.Qpac[:numberOfSteps], dtype=float)
+        QpacEffective, blocked = self.applyTmiBlock(Qpac, response, TmoSpectrum, fftLength)
+
+        Tmo = response.baselineTmo + self.convolve(QpacEffective, TmoSpectrum, fftLength, numberOfSteps)
+        Tmi = response.baselineTmi + self.convolve(QpacEffective, TmiSpectrum, fftLength, numberOfSteps)
+        Tmi[blocked] = geo.tmiBlock
+        firstNodeTemp = response.baselineNodes[0] + self.convolve(QpacEffective, nodesSpectrum[0], fftLength, numberOfSteps) # premier noeud après chaque pas
+        Tsol = np.concatenate(([283], firstNodeTemp[:-1]))
+
+        geo.Qpac[:numberOfSteps] = QpacEffective
+        geo.TmiList = Tmi.tolist()
+        geo.TmoList = [283] + np.round(Tmo, 6).tolist()
+        geo.copList = (1 + 5*((Tmi-271)/12)).tolist()
+        geo.WPac = QpacEffective / np.array(geo.copList)
+        geo.dailyTmoList = geo.calculateTmoList(Tmi[-1], geo.wellDepth, geo.wellDistanceStep, np.round(Tsol[-1], 5))
+        geo.dailyTemperatureVariation[:numberOfSteps] = Tmi - np.array(geo.TmoList[1:])
+        geo.firstNodeTempList = np.round(firstNodeTemp, 5).tolist()
+
+        if geo.motherMatrix is not None:
+            times = geo.historyTimes < numberOfSteps
+            rows = np.searchsorted(response.nodeIndices, geo.historyNodeIndices)
+            nodes = response.baselineNodes[rows] + self.convolve(QpacEffective, nodesSpectrum[rows], fftLength, numberOfSteps)
+            geo.motherMatrix[:, times] = np.round(nodes[:, geo.historyTimes[times]], 5)
+
+    def applyTmiBlock(self, Qpac, response, TmoSpectrum, fftLength):
+        # Bloquage de Tmi à tmiBlock: Qpac[t] = mdot*Cp*(Tmo[t-1] - tmiBlock) si Tmi tombe sous le seuil.
+        # Tmo[t-1] ne dépend que des Qpac précédents: l'historique est obtenu par FFT au début de chaque bloc,
+        # puis seul le bloquage est résolu pas par pas à l'intérieur du bloc.
+        geo = self.geoSystem
+        numberOfSteps = len(Qpac)
+        QpacEffective = Qpac.copy()
+        blocked = np.zeros(numberOfSteps, dtype=bool)
+
+        Tmo = response.baselineTmo + self.convolve(Qpac, TmoSpectrum, fftLength, numberOfSteps)
+        TmoPrevious = np.concatenate(([283], Tmo[:-1]))
+        candidates = np.where(TmoPrevious - Qpac / self.mdotCp < geo.tmiBlock)[0]
+        start = candidates[0] if len(candidates) else numberOfSteps  # aucun bloquage avant ce pas: la convolution directe est exacte
+
+        while start < numberOfSteps:
+            end = min(start + self.blockLength, numberOfSteps)
+            history = response.baselineTmo + self.convolve(np.where(np.arange(numberOfSteps) < start, QpacEffective, 0), TmoSpectrum, fftLength, numberOfSteps)
+            for times in range(start, end):
+                TmoPrevious = 283 if times == 0 else history[times - 1] + np.dot(QpacEffective[start:times], response.Tmo[:times - start][::-1])
+                if TmoPrevious - Qpac[times] / self.mdotCp < geo.tmiBlock:
+                    blocked[times] = True
+                    QpacEffective[times] = self.mdotCp * (TmoPrevious - geo.tmiBlock)
+            start = end
+        return QpacEffective, blocked
+
+    def convolve(self, signal, spectrum, fftLength, length):
+        return np.fft.irfft(np.fft.rfft(signal, fftLength) * spectrum, fftLength)[..., :length]
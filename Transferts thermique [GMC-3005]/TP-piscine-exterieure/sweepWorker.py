@@ -0,0 +1,63 @@
+# Worker of queued sweeps (see Optimizer.queueFile and workQueue.py): leases chunks of systems from the shared
+# queue file, computes them through Pool / GeoSystem / Heater and writes the results back, until the sweeps of the
+# queue have no work left. Workers can run on this machine or on other hosts sharing the queue file.
+#   python sweepWorker.py sweep.db                   # one worker, for every sweep of the queue
+#   python sweepWorker.py sweep.db --processes 4     # four local worker processes
+#   Optimizer(..., queueFile="sweep.db", queueWorker=False, waitForWorkers=True).optimize()  # coordinator
+
+import argparse
+import multiprocessing
+import os
+os.environ.setdefault("MPLBACKEND", "Agg")  # no display on worker hosts, should a plot be asked for (matplotlib is not imported by the model)
+
+from optimizer import Optimizer
+from workQueue import WorkQueue
+
+
+def runWorker(queueFile, sweep=None, workers=1, leaseDuration=600, queuePollInterval=5, wait=True, stopFile=None, queueChunkSize=64):
+    queue = WorkQueue(queueFile)
+    for key in [sweep] if sweep is not None else queue.getSweeps():
+        definition = queue.getDefinition(key)
+        if definition is None:
+            raise ValueError("Sweep '{}' is not in the queue {}.".format(key, queueFile))
+        optimizer = Optimizer(workers=workers, leaseDuration=leaseDuration, queuePollInterval=queuePollInterval, stopFile=stopFile, queueChunkSize=queueChunkSize, **definition)
+        if optimizer.getSweepKey() != key:
+            # the model sources differ from the ones of the coordinator: results would not be comparable
+            print("Sweep {} skipped: the model or its parameters differ from the ones of the queue".format(key[:12]))
+            continue
+        optimizer.generatePools()
+        optimizer.runQueueWorker(queue, key, wait)
+    queue.close()
+
+
+def launchLocalWorkers(queueFile, processes, **kwargs):
+    workerProcesses = [multiprocessing.Process(target=runWorker, args=(queueFile,), kwargs=kwargs) for i in range(processes)]
+    for process in workerProcesses:
+        process.start()
+    return workerProcesses
+
+
+def main(arguments=None):
+    parser = argparse.ArgumentParser(description="Computes the systems of the sweeps of a shared work queue.")
+    parser.add_argument("queueFile")
+    parser.add_argument("--sweep", help="key of the sweep to work on (default: every sweep of the queue)")
+    parser.add_argument("--processes", type=int, default=1, help="local worker processes")
+    parser.add_argument("--workers", type=int, default=1, help="pool processes used by each worker for its chunks")
+    parser.add_argument("--chunk", type=int, default=64, help="systems leased, computed and committed together")
+    parser.add_argument("--lease", type=float, default=600, help="seconds before a leased chunk can be leased by another worker")
+    parser.add_argument("--poll", type=float, default=5, help="seconds between two checks while waiting for other workers")
+    parser.add_argument("--no-wait", dest="wait", action="store_false", help="exit when nothing is left to lease, without waiting for the other workers")
+    parser.add_argument("--stop-file", help="workers stop after their current chunk when this file exists")
+    options = parser.parse_args(arguments)
+
+    kwargs = dict(sweep=options.sweep, workers=options.workers, leaseDuration=options.lease, queuePollInterval=options.poll, wait=options.wait, stopFile=options.stop_file,
+                  queueChunkSize=options.chunk)
+    if options.processes == 1:
+        runWorker(options.queueFile, **kwargs)
+    else:
+        for process in launchLocalWorkers(options.queueFile, options.processes, **kwargs):
+            process.join()
+
+
+if __name__ == '__main__':
+    main()
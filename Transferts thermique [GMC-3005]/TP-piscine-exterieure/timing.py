@@ -0,0 +1,72 @@
+import cProfile
+import functools
+import json
+import pstats
+import time
+
+# Stage timing: number of calls and cumulative wall/CPU time of the main stages of a simulation.
+# Disabled by default; a timed function then only costs one extra call and test.
+
+
+class StageTimer:
+    def __init__(self):
+        self.enabled = False
+        self.stages = {}  # name -> [calls, wall time, CPU time]
+
+    def add(self, name, wallTime, cpuTime, calls=1):
+        stage = self.stages.setdefault(name, [0, 0.0, 0.0])
+        stage[0] += calls
+        stage[1] += wallTime
+        stage[2] += cpuTime
+
+    def merge(self, stages):
+        # adds the stages measured elsewhere (e.g. by a worker process)
+        for name, (calls, wallTime, cpuTime) in stages.items():
+            self.add(name, wallTime, cpuTime, calls)
+
+    def pop(self):
+        stages, self.stages = self.stages, {}
+        return stages
+
+    def reset(self):
+        self.stages = {}
+
+    def toDict(self):
+        return {name: {"calls": calls, "wall": wallTime, "cpu": cpuTime} for name, (calls, wallTime, cpuTime) in self.stages.items()}
+
+    def toJson(self, path):
+        with open(path, "w") as file:
+            json.dump(self.toDict(), file, indent=2, sort_keys=True)
+
+    def printSummary(self):
+        print("|{:>40}|{:>10}|{:>10}|{:>10}|{:>12}|".format("STAGE", "CALLS", "WALL s", "CPU s", "WALL/CALL ms"))
+        for name, (calls, wallTime, cpuTime) in sorted(self.stages.items(), key=lambda item: -item[1][1]):
+            print("|{:>40}|{:>10}|{:>10.3f}|{:>10.3f}|{:>12.4f}|".format(name, calls, wallTime, cpuTime, 1000 * wallTime / max(calls, 1)))
+
+
+stageTimer = StageTimer()
+
+
+def timed(name):
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not stageTimer.enabled:
+                return function(*args, **kwargs)
+            wallStart, cpuStart = time.perf_counter(), time.process_time()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                stageTimer.add(name, time.perf_counter() - wallStart, time.process_time() - cpuStart)
+        return wrapper
+    return decorator
+
+
+def profileHeater(heater, path=None, sortBy="cumulative", limit=25):
+    # runs one complete system (heater.getQExchanger) under cProfile and prints the most expensive functions
+    profiler = cProfile.Profile()
+    profiler.runcall(heater.getQExchanger)
+    if path is not None:
+        profiler.dump_stats(path)
+    pstats.Stats(profiler).sort_stats(sortBy).print_stats(limit)
+    return profiler
@@ -0,0 +1,115 @@
+import numpy as np
+import hashlib
+import itertools
+
+# Weather records for Pool (see Pool.weather): air temperature [°C], wind velocity [m/s] and relative humidity [0-1]
+# at a fixed step (hourly: 24 samples per day, 8760 per year). The columns are stored as one float32 array
+# (samples x columns), or memory-mapped from a .npy file so that decade-long records stay on disk.
+# CSV files are read in chunks, straight into that array.
+# A simulation follows the record year by year (getYears); the mean year (getYear(None)) smooths the hourly extremes
+# that size the vapor exchanger, and is only used when asked for.
+
+columns = ["airTemp", "windVelocity", "relativeHumidity"]
+
+
+class WeatherSource:
+    def __init__(self, data, samplesPerDay=24):
+        self.data = data  # samples x columns, float32 (array or memmap)
+        self.samplesPerDay = samplesPerDay
+        self.samplesPerYear = 365 * samplesPerDay
+        self.numberOfYears = len(data) // self.samplesPerYear  # complete years of the record
+        self.keys = {}
+        if self.numberOfYears == 0:
+            raise ValueError("A weather record must cover at least one year ({} samples), got {}.".format(self.samplesPerYear, len(data)))
+
+    def getColumn(self, name):
+        return self.data[:, columns.index(name)]
+
+    def getRecordYears(self, firstYear, numberOfYears):
+        # numberOfYears consecutive years of the record from firstYear, starting over at its first year when it is shorter
+        if not 0 <= firstYear < self.numberOfYears:
+            raise ValueError("Weather year {} outside of the record ({} complete years).".format(firstYear, self.numberOfYears))
+        return [(firstYear + i) % self.numberOfYears for i in range(numberOfYears)]
+
+    def getYears(self, firstYear=0, numberOfYears=1):
+        # profile of each column (float64) over numberOfYears consecutive years of the record (see getRecordYears)
+        profile = np.concatenate([self.data[year*self.samplesPerYear:(year+1)*self.samplesPerYear] for year in self.getRecordYears(firstYear, numberOfYears)]).astype(float)
+        return [profile[:, i] for i in range(len(columns))]
+
+    def getYear(self, year=None):
+        # annual profile of each column (float64): one year of the record, or the mean of its complete years (None),
+        # read one year at a time
+        if year is not None:
+            return self.getYears(year, 1)
+        profile = np.zeros((self.samplesPerYear, len(columns)))
+        for start in range(0, self.numberOfYears * self.samplesPerYear, self.samplesPerYear):
+            profile += self.data[start:start+self.samplesPerYear]
+        profile /= self.numberOfYears
+        return [profile[:, i] for i in range(len(columns))]
+
+    def getKey(self, year=None, numberOfYears=1):
+        # digest of the data behind getYears(year, numberOfYears), or getYear(None), so that results of different
+        # records are cached apart (see Pool.weatherKey)
+        if (year, numberOfYears) not in self.keys:
+            digest = hashlib.sha256("{} {} {}".format(self.samplesPerDay, year, numberOfYears).encode())
+            years = range(self.numberOfYears) if year is None else self.getRecordYears(year, numberOfYears)
+            for start in (y * self.samplesPerYear for y in years):
+                digest.update(np.ascontiguousarray(self.data[start:start+self.samplesPerYear]).tobytes())
+            self.keys[(year, numberOfYears)] = digest.hexdigest()
+        return self.keys[(year, numberOfYears)]
+
+
+def readCsv(path, samplesPerDay=24, chunkSize=8760, memmapPath=None, names=None, delimiter=","):
+    # CSV with a header row; names maps each weather column to its header in the file (default: the same names).
+    # With memmapPath, the record is written to that .npy file and memory-mapped instead of kept in memory.
+    names = names or {name: name for name in columns}
+    with open(path) as file:
+        header = [name.strip() for name in file.readline().split(delimiter)]
+        numberOfSamples = sum(1 for line in file if line.strip())
+    fileColumns = [header.index(names[name]) for name in columns]
+
+    shape = (numberOfSamples, len(columns))
+    if memmapPath is not None:
+        data = np.lib.format.open_memmap(memmapPath, mode="w+", dtype=np.float32, shape=shape)
+    else:
+        data = np.empty(shape, dtype=np.float32)
+
+    with open(path) as file:
+        file.readline()
+        row = 0
+        while True:
+            lines = list(itertools.islice(file, chunkSize))
+            if not lines:
+                break
+            lines = [line for line in lines if line.strip()]
+            if lines:
+                chunk = np.loadtxt(lines, delimiter=delimiter, usecols=fileColumns, dtype=np.float32, ndmin=2)
+                data[row:row+len(chunk)] = chunk
+                row += len(chunk)
+    if memmapPath is not None:
+        data.flush()
+    return WeatherSource(data, samplesPerDay)
+
+
+def loadBinary(path, samplesPerDay=24, memmap=True):
+    # .npy file written by saveBinary (or readCsv with memmapPath)
+    data = np.load(path, mmap_mode="r" if memmap else None)
+    if data.dtype != np.float32 or data.ndim != 2 or data.shape[1] != len(columns):
+        raise ValueError("{} is not a weather record: expected float32 samples x {} columns, got {} {}.".format(path, len(columns), data.dtype, data.shape))
+    return WeatherSource(data, samplesPerDay)
+
+
+def saveBinary(source, path, chunkSize=8760):
+    data = np.lib.format.open_memmap(path, mode="w+", dtype=np.float32, shape=source.data.shape)
+    for start in range(0, len(source.data), chunkSize):
+        data[start:start+chunkSize] = source.data[start:start+chunkSize]
+    data.flush()
+
+
+def getSinusoidWeather(numberOfYears=1, samplesPerDay=24, windVelocity=3, relativeHumidity=0.5):
+    # the annual sinusoid of Pool.setAirTemp at samplesPerDay, with constant wind and humidity
+    timeVector = np.arange(numberOfYears * 365 * samplesPerDay) / samplesPerDay
+    airTemp = 6.4 + 29.5 * np.sin(1.5 * np.pi + 2 * np.pi * timeVector / 365)
+    data = np.empty((len(timeVector), len(columns)), dtype=np.float32)
+    data[:, 0], data[:, 1], data[:, 2] = airTemp, windVelocity, relativeHumidity
+    return WeatherSource(data, samplesPerDay)
@@ -0,0 +1,107 @@
+import hashlib
+import json
+import sqlite3
+import time
+from resultCache import getModelVersion
+
+# On-disk work queue of a sweep (SQLite file): one row per system with its parameters, its state ("pending",
+# "leased" or "done") and, once done, its result row and physical outputs. Workers lease chunks of systems for a
+# limited time and commit each finished chunk, so a sweep that stops (crash, stop file, range or shard done)
+# continues from the systems not done when it is started again, and the systems of a worker that died are leased
+# again once their lease expires. Several processes, on this machine or on others sharing the file system, can
+# use the same file (SQLite locking must work on that file system; lease expiry assumes synchronized clocks).
+
+
+def getSweepKey(numberOfYears, grids, weatherKey=None, engine="timeStepping"):
+    # same model, engine, duration, parameter grids and weather: same sweep
+    sweep = {"version": getModelVersion(), "engine": engine, "numberOfYears": numberOfYears, "grids": [[float(value) for value in grid] for grid in grids]}
+    if weatherKey is not None:
+        sweep["weather"] = weatherKey
+    return hashlib.sha256(json.dumps(sweep, sort_keys=True).encode()).hexdigest()
+
+
+def toJson(value):
+    return json.dumps(value, default=lambda item: item.item())  # numpy scalars
+
+
+class WorkQueue:
+    def __init__(self, path):
+        self.path = path
+        self.expiredLeases = 0  # systems leased again by this process after the lease of another worker expired
+        self.connection = sqlite3.connect(path, timeout=60)
+        self.connection.execute("CREATE TABLE IF NOT EXISTS systems (sweep TEXT, id INTEGER, parameters TEXT, state TEXT, result TEXT, outputs TEXT, "
+                                "worker TEXT, leaseExpiry REAL, PRIMARY KEY (sweep, id))")
+        self.connection.execute("CREATE TABLE IF NOT EXISTS sweeps (sweep TEXT PRIMARY KEY, definition TEXT)")
+        columns = [row[1] for row in self.connection.execute("PRAGMA table_info(systems)")]
+        for column, columnType in (("worker", "TEXT"), ("leaseExpiry", "REAL")):  # queue files written before leases
+            if column not in columns:
+                self.connection.execute("ALTER TABLE systems ADD COLUMN {} {}".format(column, columnType))
+        self.connection.commit()
+
+    def addSweep(self, sweep, parameters, definition=None):
+        # systems already in the queue (previous run of the same sweep) keep their state;
+        # definition: Optimizer arguments a worker needs to build the same systems (see Optimizer.getSweepDefinition)
+        self.connection.execute("INSERT OR IGNORE INTO sweeps (sweep, definition) VALUES (?, ?)", (sweep, toJson(definition)))
+        rows = ((sweep, i, toJson(list(point))) for i, point in enumerate(parameters))
+        self.connection.executemany("INSERT OR IGNORE INTO systems (sweep, id, parameters, state) VALUES (?, ?, ?, 'pending')", rows)
+        self.connection.commit()
+
+    def getSweeps(self):
+        return [sweep for sweep, in self.connection.execute("SELECT sweep FROM sweeps ORDER BY rowid")]
+
+    def getDefinition(self, sweep):
+        row = self.connection.execute("SELECT definition FROM sweeps WHERE sweep = ?", (sweep,)).fetchone()
+        return json.loads(row[0]) if row is not None else None
+
+    def getSelection(self, start, stop, shard):
+        # systems of the range [start, stop) that belong to the shard (index, count)
+        return "id >= ? AND id < ? AND id % ? = ?", (start, stop if stop is not None else 2**62, shard[1], shard[0])
+
+    def lease(self, sweep, worker, count, duration, start=0, stop=None, shard=(0, 1)):
+        # leases up to count systems, pending or with an expired lease, in sweep order
+        selection, selectionValues = self.getSelection(start, stop, shard)
+        now = time.time()
+        self.connection.execute("BEGIN IMMEDIATE")  # one worker at a time between the select and the update
+        try:
+            rows = self.connection.execute("SELECT id, parameters, state FROM systems WHERE sweep = ? AND (state = 'pending' OR (state = 'leased' AND leaseExpiry < ?)) AND "
+                                           + selection + " ORDER BY id LIMIT ?", (sweep, now) + selectionValues + (count,)).fetchall()
+            self.connection.executemany("UPDATE systems SET state = 'leased', worker = ?, leaseExpiry = ? WHERE sweep = ? AND id = ?",
+                                        [(worker, now + duration, sweep, systemId) for systemId, parameters, state in rows])
+            self.connection.commit()
+        except BaseException:
+            self.connection.rollback()
+            raise
+        self.expiredLeases += sum(state == "leased" for systemId, parameters, state in rows)
+        return [(systemId, tuple(json.loads(parameters))) for systemId, parameters, state in rows]
+
+    def releaseLeases(self, sweep, isOrphaned):
+        # systems leased by workers for which isOrphaned(worker) is true (e.g. a process of this host that no longer
+        # exists) go back to pending right away, instead of waiting for their lease to expire
+        workers = [worker for worker, in self.connection.execute("SELECT DISTINCT worker FROM systems WHERE sweep = ? AND state = 'leased'", (sweep,))]
+        released = 0
+        for worker in filter(isOrphaned, workers):
+            released += self.connection.execute("UPDATE systems SET state = 'pending', worker = NULL, leaseExpiry = NULL WHERE sweep = ? AND state = 'leased' AND worker = ?",
+                                                (sweep, worker)).rowcount
+        self.connection.commit()
+        return released
+
+    def complete(self, sweep, results, worker=None):
+        # results: (id, result row, physical outputs) of the finished systems, committed together
+        # (a system finished twice, after its lease expired, keeps the first result)
+        rows = [(toJson(row), toJson(outputs), worker, sweep, systemId) for systemId, row, outputs in results]
+        self.connection.executemany("UPDATE systems SET state = 'done', result = ?, outputs = ?, worker = ? WHERE sweep = ? AND id = ? AND state != 'done'", rows)
+        self.connection.commit()
+
+    def countUnfinished(self, sweep, start=0, stop=None, shard=(0, 1)):
+        selection, selectionValues = self.getSelection(start, stop, shard)
+        return self.connection.execute("SELECT COUNT(*) FROM systems WHERE sweep = ? AND state != 'done' AND " + selection, (sweep,) + selectionValues).fetchone()[0]
+
+    def getResults(self, sweep):
+        rows = self.connection.execute("SELECT result, outputs FROM systems WHERE sweep = ? AND state = 'done' ORDER BY id", (sweep,)).fetchall()
+        return [(json.loads(result), json.loads(outputs)) for result, outputs in rows]
+
+    def getCounts(self, sweep):
+        return dict(self.connection.execute("SELECT state, COUNT(*) FROM systems WHERE sweep = ? GROUP BY state", (sweep,)).fetchall())
+
+    def close(self):
+        self.connection.close()